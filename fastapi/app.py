@@ -1,26 +1,233 @@
-from fastapi import FastAPI
+import os
+import sys
+import json
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Literal
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, Field
 import uvicorn
 
-app = FastAPI()
+from item_store import create_item_store, MemoryItemStore
+from request_metrics import RequestMetrics, RequestMetricsMiddleware, SlowRequestProfiler
+
+# 文档检索: 与 mcp/mcp_server_stdio.py 共用同一个 search_core
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mcp"))
+import search_core
+from blocking_executor import BlockingExecutor
+from metadata_filter import build_filters
+
+logger = logging.getLogger("sample-api")
 
 fake_itme_db = [{"item_name": "Foo"}, {"item_name": "Bar"}, {"item_name": "Baz"}]
 
+# worker进程数, 也读取uvicorn --workers 使用的WEB_CONCURRENCY
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", os.getenv("WEB_CONCURRENCY", "1")))
+
+# 数据存储: ITEM_STORE=memory|sqlite
+# memory存储只在单个进程内可见, 多个worker时一个worker创建的item在其他worker上不存在
+item_store = create_item_store()
+if isinstance(item_store, MemoryItemStore) and WEB_WORKERS > 1:
+    raise RuntimeError(f"ITEM_STORE=memory keeps items per process, use ITEM_STORE=sqlite with {WEB_WORKERS} workers")
+item_store.seed([item["item_name"] for item in fake_itme_db])
+
+
+# 检索为阻塞调用, 每个进程一个线程池, 所有请求共用
+search_executor = BlockingExecutor(
+    "search",
+    max_workers=int(os.getenv("SEARCH_WORKERS", "4")),
+    max_concurrency=int(os.getenv("SEARCH_CONCURRENCY", "8")),
+    timeout=float(os.getenv("SEARCH_TIMEOUT", "30")),
+    metrics=search_core.metrics,
+)
+
+
+# 监控: 每个路由的延迟直方图/进行中请求数/响应大小和状态码, GET /metrics 为Prometheus文本格式
+# 多个worker时设置METRICS_DIR, 各worker的计数写入该目录并在/metrics中汇总
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+request_metrics = RequestMetrics(METRICS_DIR)
+
+# 慢请求采样分析: 设置SLOW_REQUEST_SECONDS后开启, 折叠栈写入PROFILE_DIR
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "0"))
+slow_request_profiler = SlowRequestProfiler(
+    SLOW_REQUEST_SECONDS,
+    interval=float(os.getenv("PROFILE_INTERVAL", "0.005")),
+    output_dir=os.getenv("PROFILE_DIR"),
+) if SLOW_REQUEST_SECONDS > 0 else None
+
+
+async def flush_metrics():
+    while True:
+        await asyncio.sleep(METRICS_FLUSH_INTERVAL)
+        await asyncio.to_thread(request_metrics.flush)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 每个worker进程只打开一次collection和embedder
+    try:
+        await asyncio.to_thread(search_core.open_search_collection)
+    except Exception as ex:
+        logger.error(f"Error opening ChromaDB collection: {ex}")
+    flush_task = asyncio.create_task(flush_metrics()) if METRICS_DIR else None
+    if slow_request_profiler is not None:
+        slow_request_profiler.start()
+    yield
+    if flush_task:
+        flush_task.cancel()
+    if slow_request_profiler is not None:
+        slow_request_profiler.stop()
+    request_metrics.flush()
+    search_executor.shutdown()
+    item_store.close()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(RequestMetricsMiddleware, metrics=request_metrics, routes=app.routes, profiler=slow_request_profiler)
+
+
+class Item(BaseModel):
+    item_name: str
+
+
+class SearchRequest(BaseModel):
+    queries: list[str] = Field(min_length=1, max_length=32)
+    num_results: int = Field(5, ge=1, le=50)
+    mode: Literal["vector", "lexical", "hybrid"] = "vector"
+    document: str | list[str] | None = None
+    page_from: int | None = None
+    page_to: int | None = None
+    metadata: dict | None = None
+    contains: str | None = None
+    mmr_lambda: float | None = Field(None, ge=0, le=1)
+
+
 # Hello World
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(request_metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # 路径参数
 @app.get("/items/{item_id}")
-async def read_item(item_id: int):
-    return {"item_id": item_id}
+def read_item(item_id: int):
+    item = item_store.get(item_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail=f"Item {item_id} not found")
+    return item
 
-# 查询参数
+# 查询参数: cursor为上一页最后一个item_id, 返回的next_cursor用于获取下一页
 @app.get("/items")
-async def read_item(skip: int = 0, limit: int = 10):
-    return fake_itme_db[skip : skip + limit]
+def list_items(limit: int = Query(10, ge=1, le=1000), cursor: int | None = None, item_name: str | None = None):
+    items, next_cursor = item_store.list_items(limit, cursor, item_name)
+    return {"items": items, "next_cursor": next_cursor}
+
+# 请求体
+@app.post("/items", status_code=201)
+def create_item(item: Item):
+    return item_store.add(item.item_name)
+
+@app.delete("/items/{item_id}", status_code=204)
+def delete_item(item_id: int):
+    if not item_store.delete(item_id):
+        raise HTTPException(status_code=404, detail=f"Item {item_id} not found")
+
+
+# 文档检索
+def search_hit(hit: tuple, score_label: str | None) -> dict:
+    doc_id, doc, score, metadata = hit[:4]
+    return {
+        "id": doc_id,
+        "score": score,
+        "score_type": score_label.lower() if score_label else "distance",
+        "text": doc,
+        # 与page_from/page_to及document://资源URI一致, 从1开始; metadata中的page从0开始
+        "page": metadata["page"] + 1 if metadata and metadata.get("page") is not None else None,
+        "metadata": metadata,
+    }
+
+
+def search_one(search: SearchRequest, query: str, where: dict, where_document: dict) -> list[dict]:
+    hits, score_label = search_core.run_search(
+        query, search.num_results, search.mode, where, where_document, search.mmr_lambda
+    )
+    return [search_hit(hit, score_label) for hit in hits]
+
+
+# 批量查询: 纯向量检索合并为一次embedding调用和一次collection查询
+def search_batch(search: SearchRequest, queries: list[str], where: dict, where_document: dict) -> list[list[dict]]:
+    if search.mode == "vector" and search.mmr_lambda is None:
+        results_list = search_core.search_collection_batch(queries, search.num_results, where, where_document)
+        return [[search_hit(hit, None) for hit in search_core.iter_hits(results)] for results in results_list]
+    return [search_one(search, query, where, where_document) for query in queries]
+
+
+def prepare_search(search: SearchRequest) -> tuple[list[str], dict, dict]:
+    queries = [query for query in search.queries if query and query.strip()]
+    if not queries:
+        raise HTTPException(status_code=400, detail="At least one query is required")
+    if not search_core.collection and (search.mode != "lexical" or search.mmr_lambda is not None):
+        raise HTTPException(status_code=503, detail="ChromaDB collection is not initialized, run pdf_ingest.py first")
+    try:
+        where, where_document = build_filters(search.model_dump(include={"document", "page_from", "page_to", "metadata", "contains"}))
+    except ValueError as ex:
+        raise HTTPException(status_code=400, detail=str(ex))
+    return queries, where, where_document
+
+
+@app.post("/search")
+async def search(search: SearchRequest):
+    queries, where, where_document = prepare_search(search)
+    try:
+        hits_list = await search_executor.run(search_batch, search, queries, where, where_document)
+    except TimeoutError as ex:
+        raise HTTPException(status_code=504, detail=str(ex))
+    except ValueError as ex:
+        raise HTTPException(status_code=400, detail=str(ex))
+    return {"results": [{"query": query, "hits": hits} for query, hits in zip(queries, hits_list)]}
+
+
+# 流式返回: 每个查询排好序后立即输出一行, 顺序按完成先后, 用query_index对应请求
+# Accept: text/event-stream 时以SSE格式输出, 否则为NDJSON
+@app.post("/search/stream")
+async def search_stream(search: SearchRequest, request: Request):
+    queries, where, where_document = prepare_search(search)
+    sse = "text/event-stream" in request.headers.get("accept", "")
+
+    def encode(event: str, payload: dict) -> str:
+        data = json.dumps(payload, ensure_ascii=False)
+        return f"event: {event}\ndata: {data}\n\n" if sse else f"{data}\n"
+
+    async def run(query_index: int, query: str) -> dict:
+        try:
+            hits = await search_executor.run(search_one, search, query, where, where_document)
+            return {"query_index": query_index, "query": query, "hits": hits}
+        except Exception as ex:
+            return {"query_index": query_index, "query": query, "error": str(ex)}
+
+    async def events():
+        tasks = [asyncio.create_task(run(i, query)) for i, query in enumerate(queries)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                result = await task
+                yield encode("error" if "error" in result else "result", result)
+            yield encode("done", {"queries": len(queries)})
+        finally:
+            # 客户端断开后不再等待剩余的查询
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream" if sse else "application/x-ndjson")
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # 每个worker进程各自打开collection, 通过增加worker或主机横向扩展
+    uvicorn.run("app:app", host="0.0.0.0", port=8000, workers=WEB_WORKERS)
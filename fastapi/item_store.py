@@ -0,0 +1,186 @@
+import os
+import queue
+import sqlite3
+import threading
+from bisect import bisect_right, insort
+from contextlib import contextmanager
+
+# Item stores for the sample API. Both keep items ordered by id and page with a
+# cursor (the last id seen), so page N costs the same as page 1:
+#   list_items(limit, cursor) -> (items, next_cursor)
+
+
+# In-memory store: dict lookup by id, sorted id lists for paging and for each item_name
+class MemoryItemStore:
+    def __init__(self):
+        self.items = {}
+        self.ids = []
+        self.by_name = {}
+        self.next_id = 1
+        self._lock = threading.Lock()
+
+    def add(self, item_name: str) -> dict:
+        with self._lock:
+            return self._add(item_name)
+
+    def _add(self, item_name: str) -> dict:
+        item = {"item_id": self.next_id, "item_name": item_name}
+        self.next_id += 1
+        self.items[item["item_id"]] = item
+        self.ids.append(item["item_id"])
+        insort(self.by_name.setdefault(item_name, []), item["item_id"])
+        return item
+
+    # Add the items only if the store is empty
+    def seed(self, item_names: list[str]):
+        with self._lock:
+            if not self.items:
+                for item_name in item_names:
+                    self._add(item_name)
+
+    def get(self, item_id: int) -> dict | None:
+        with self._lock:
+            return self.items.get(item_id)
+
+    def delete(self, item_id: int) -> bool:
+        with self._lock:
+            item = self.items.pop(item_id, None)
+            if item is None:
+                return False
+            self._remove(self.ids, item_id)
+            name_ids = self.by_name[item["item_name"]]
+            self._remove(name_ids, item_id)
+            if not name_ids:
+                del self.by_name[item["item_name"]]
+            return True
+
+    # Binary search finds the id, the list delete shifts the tail and is O(n)
+    @staticmethod
+    def _remove(ids: list[int], item_id: int):
+        index = bisect_right(ids, item_id) - 1
+        if index >= 0 and ids[index] == item_id:
+            del ids[index]
+
+    def list_items(self, limit: int = 10, cursor: int = None, item_name: str = None) -> tuple[list[dict], int | None]:
+        # Deletes run on other threadpool threads, the page is read under the lock
+        with self._lock:
+            ids = self.ids if item_name is None else self.by_name.get(item_name, [])
+            start = bisect_right(ids, cursor) if cursor is not None else 0
+            page_ids = ids[start:start + limit]
+            next_cursor = page_ids[-1] if start + limit < len(ids) else None
+            return [self.items[item_id] for item_id in page_ids], next_cursor
+
+    def count(self) -> int:
+        return len(self.items)
+
+    def close(self):
+        pass
+
+
+# SQLite store with a fixed pool of connections shared by the request threads.
+# Keyset pages use the primary key, or the (item_name, item_id) index when filtered.
+class SqliteItemStore:
+    def __init__(self, path: str, pool_size: int = 4):
+        self.path = path
+        self._pool = queue.Queue()
+        for _ in range(max(pool_size, 1)):
+            self._pool.put(self._connect())
+
+        with self.connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS items ("
+                "item_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "item_name TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS items_item_name ON items (item_name, item_id)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # Borrow a connection, blocks while all of them are in use
+    @contextmanager
+    def connection(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def add(self, item_name: str) -> dict:
+        with self.connection() as conn:
+            cursor = conn.execute("INSERT INTO items (item_name) VALUES (?)", (item_name,))
+            return {"item_id": cursor.lastrowid, "item_name": item_name}
+
+    # Add the items only if the table is empty. Worker processes seed at the same time,
+    # so the emptiness check and the insert run under one write lock (BEGIN IMMEDIATE).
+    def seed(self, item_names: list[str]):
+        if not item_names:
+            return
+        values = ", ".join("(?)" for _ in item_names)
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    f"INSERT INTO items (item_name) SELECT column1 FROM (VALUES {values}) "
+                    "WHERE NOT EXISTS (SELECT 1 FROM items)",
+                    item_names,
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def get(self, item_id: int) -> dict | None:
+        with self.connection() as conn:
+            row = conn.execute("SELECT item_id, item_name FROM items WHERE item_id = ?", (item_id,)).fetchone()
+        return dict(row) if row else None
+
+    def delete(self, item_id: int) -> bool:
+        with self.connection() as conn:
+            return conn.execute("DELETE FROM items WHERE item_id = ?", (item_id,)).rowcount > 0
+
+    def list_items(self, limit: int = 10, cursor: int = None, item_name: str = None) -> tuple[list[dict], int | None]:
+        clauses, params = [], []
+        if item_name is not None:
+            clauses.append("item_name = ?")
+            params.append(item_name)
+        if cursor is not None:
+            clauses.append("item_id > ?")
+            params.append(cursor)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        # One extra row tells whether another page follows
+        with self.connection() as conn:
+            rows = conn.execute(
+                f"SELECT item_id, item_name FROM items {where} ORDER BY item_id LIMIT ?",
+                (*params, limit + 1),
+            ).fetchall()
+
+        items = [dict(row) for row in rows[:limit]]
+        next_cursor = items[-1]["item_id"] if len(rows) > limit else None
+        return items, next_cursor
+
+    def count(self) -> int:
+        with self.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+# ITEM_STORE selects the implementation: memory (default) or sqlite
+def create_item_store():
+    backend = os.getenv("ITEM_STORE", "memory")
+    if backend == "sqlite":
+        return SqliteItemStore(
+            os.getenv("ITEM_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "items.db")),
+            int(os.getenv("ITEM_DB_POOL_SIZE", "4")),
+        )
+    if backend == "memory":
+        return MemoryItemStore()
+    raise ValueError(f"Unknown item store: {backend}")
@@ -0,0 +1,264 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from bisect import bisect_left
+from collections import Counter, deque
+from starlette.routing import Match
+
+# Per-route request metrics for the sample API, exported in Prometheus text format.
+# Routes are labelled by their path template (/items/{item_id}), not the raw path,
+# so the number of series stays bounded.
+#
+# With several uvicorn workers every process counts its own requests. When
+# METRICS_DIR is set each worker writes its counts there and /metrics sums the
+# files of all workers, whichever worker answers the scrape. Like the multiprocess
+# mode of prometheus_client, the directory should be emptied before the server starts.
+
+logger = logging.getLogger("sample-api-metrics")
+
+# Latency bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    def __init__(self, metrics_dir: str = None):
+        self.metrics_dir = metrics_dir
+        self.requests = Counter()       # (method, route, status) -> requests
+        self.response_bytes = Counter()  # (method, route) -> bytes
+        self.latency = {}               # (method, route) -> [bucket counts..., sum]
+        self.in_flight = Counter()      # (method, route) -> requests
+        self._lock = threading.Lock()
+        if metrics_dir:
+            os.makedirs(metrics_dir, exist_ok=True)
+
+    def start(self, method: str, route: str):
+        with self._lock:
+            self.in_flight[(method, route)] += 1
+
+    def finish(self, method: str, route: str, status: int, seconds: float, size: int):
+        with self._lock:
+            self.in_flight[(method, route)] -= 1
+            self.requests[(method, route, status)] += 1
+            self.response_bytes[(method, route)] += size
+            histogram = self.latency.get((method, route))
+            if histogram is None:
+                histogram = self.latency[(method, route)] = [0] * (len(LATENCY_BUCKETS) + 2)
+            histogram[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            histogram[-1] += seconds
+
+    def state(self) -> dict:
+        with self._lock:
+            return {
+                "requests": [[*key, value] for key, value in self.requests.items()],
+                "response_bytes": [[*key, value] for key, value in self.response_bytes.items()],
+                "latency": [[*key, list(value)] for key, value in self.latency.items()],
+                "in_flight": [[*key, value] for key, value in self.in_flight.items() if value],
+            }
+
+    # Write this worker's counts for the other workers to read, replaced atomically
+    def flush(self):
+        if not self.metrics_dir:
+            return
+        path = os.path.join(self.metrics_dir, f"{os.getpid()}.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self.state(), f)
+        os.replace(f"{path}.tmp", path)
+
+    # Counts of all workers; counters of exited workers are kept, their in-flight gauges are not
+    def collect(self) -> list[dict]:
+        if not self.metrics_dir:
+            return [self.state()]
+
+        self.flush()
+        states = []
+        for name in os.listdir(self.metrics_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.metrics_dir, name), encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not process_alive(int(name[:-5])):
+                state["in_flight"] = []
+            states.append(state)
+        return states
+
+    def render(self) -> str:
+        requests, response_bytes, in_flight, latency = Counter(), Counter(), Counter(), {}
+        for state in self.collect():
+            for method, route, status, value in state["requests"]:
+                requests[(method, route, status)] += value
+            for method, route, value in state["response_bytes"]:
+                response_bytes[(method, route)] += value
+            for method, route, value in state["in_flight"]:
+                in_flight[(method, route)] += value
+            for method, route, value in state["latency"]:
+                merged = latency.setdefault((method, route), [0] * len(value))
+                for i, count in enumerate(value):
+                    merged[i] += count
+
+        lines = [
+            "# HELP http_requests_total Requests by route and status code.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), value in sorted(requests.items()):
+            lines.append(f'http_requests_total{{method="{method}",route="{escape(route)}",status="{status}"}} {value}')
+
+        lines += [
+            "# HELP http_response_bytes_total Response body bytes by route.",
+            "# TYPE http_response_bytes_total counter",
+        ]
+        for (method, route), value in sorted(response_bytes.items()):
+            lines.append(f'http_response_bytes_total{{method="{method}",route="{escape(route)}"}} {value}')
+
+        lines += [
+            "# HELP http_requests_in_flight Requests being handled by route.",
+            "# TYPE http_requests_in_flight gauge",
+        ]
+        for (method, route), value in sorted(in_flight.items()):
+            lines.append(f'http_requests_in_flight{{method="{method}",route="{escape(route)}"}} {value}')
+
+        lines += [
+            "# HELP http_request_duration_seconds Request latency by route, until the response body is sent.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), histogram in sorted(latency.items()):
+            labels = f'method="{method}",route="{escape(route)}"'
+            cumulative = 0
+            for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), histogram[:-1]):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {histogram[-1]:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {cumulative}")
+
+        return "\n".join(lines) + "\n"
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Opt-in sampling profiler for slow requests. A background thread samples the
+# stacks of all threads every `interval` seconds into a short ring buffer; when a
+# request takes longer than `slow_seconds`, the samples taken during it are folded
+# into flamegraph.pl / speedscope input in `output_dir` and the hottest stacks are
+# logged. Samples cover every thread of the worker, including concurrent requests.
+class SlowRequestProfiler:
+    # Leaf frames of threads that are only waiting for work
+    IDLE_FRAMES = {("threading.py", "wait"), ("selectors.py", "select"), ("queue.py", "get"), ("thread.py", "_worker")}
+
+    def __init__(self, slow_seconds: float, interval: float = 0.005, output_dir: str = None, history_seconds: float = 60.0):
+        self.slow_seconds = slow_seconds
+        self.interval = interval
+        self.output_dir = output_dir
+        self.samples = deque(maxlen=max(int(history_seconds / interval), 1))
+        self._stop = threading.Event()
+        self._thread = None
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._sample_loop, name="slow-request-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _sample_loop(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append((os.path.basename(frame.f_code.co_filename), frame.f_code.co_name))
+                    frame = frame.f_back
+                if stack[0] not in self.IDLE_FRAMES:
+                    self.samples.append((now, ";".join(f"{name}:{func}" for name, func in reversed(stack))))
+
+    # Folded stack counts of the samples taken between `started` and `finished`
+    def folded(self, started: float, finished: float) -> Counter:
+        return Counter(stack for at, stack in list(self.samples) if started <= at <= finished)
+
+    def request_finished(self, method: str, path: str, started: float, finished: float):
+        seconds = finished - started
+        if seconds < self.slow_seconds:
+            return
+
+        stacks = self.folded(started, finished)
+        hottest = ", ".join(f"{stack.rsplit(';', 1)[-1]} x{count}" for stack, count in stacks.most_common(5))
+        logger.warning(f"Slow request {method} {path}: {seconds * 1000:.1f}ms, {sum(stacks.values())} samples, top frames: {hottest}")
+
+        if self.output_dir and stacks:
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{method}{path.replace('/', '_')[:80]}.folded"
+            with open(os.path.join(self.output_dir, name), "w", encoding="utf-8") as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in stacks.items())
+
+
+# ASGI middleware recording every HTTP request of the wrapped app. The route
+# template is looked up in `routes` before the request runs, so that the
+# in-flight gauge carries the same label as the finished request.
+class RequestMetricsMiddleware:
+    def __init__(self, app, metrics: RequestMetrics, routes: list, profiler: SlowRequestProfiler = None):
+        self.app = app
+        self.metrics = metrics
+        self.routes = routes
+        self.profiler = profiler
+
+    # Path template of the matching route, a method mismatch (405) still names the route
+    def route_label(self, scope) -> str:
+        partial = None
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", "unmatched")
+            if match == Match.PARTIAL and partial is None:
+                partial = getattr(route, "path", None)
+        return partial or "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        route = self.route_label(scope)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        self.metrics.start(method, route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finished = time.perf_counter()
+            self.metrics.finish(method, route, status, finished - started, size)
+            if self.profiler is not None:
+                self.profiler.request_finished(method, route, started, finished)
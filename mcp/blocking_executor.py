@@ -0,0 +1,41 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Runs blocking calls off the event loop with a concurrency limit and per-call timeouts.
+# A call that times out or whose request is cancelled stops being awaited right away;
+# the worker thread finishes in the background and its result is discarded.
+class BlockingExecutor:
+    def __init__(self, name: str, max_workers: int = 4, max_concurrency: int = None, timeout: float = None, metrics=None):
+        self.name = name
+        self.metrics = metrics
+        self.timeout = timeout if timeout and timeout > 0 else None
+        self.max_concurrency = max_concurrency or max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.in_flight = 0
+
+    async def run(self, func, *args, timeout: float = None, **kwargs):
+        timeout = timeout or self.timeout
+        submitted = time.perf_counter()
+
+        # Time spent queued for a slot and a worker thread
+        def call():
+            if self.metrics is not None:
+                self.metrics.record(f"executor.{self.name}.wait", time.perf_counter() - submitted)
+            return func(*args, **kwargs)
+
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._pool, call)
+            self.in_flight += 1
+            try:
+                return await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"{getattr(func, '__name__', 'call')} timed out after {timeout}s")
+            finally:
+                self.in_flight -= 1
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
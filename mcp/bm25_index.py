@@ -0,0 +1,106 @@
+import os
+import re
+import math
+import heapq
+import pickle
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+# Keeps dotted/dashed identifiers such as metric names and CLI flags together
+TOKEN_PATTERN = re.compile(r"\w+(?:[\-\.]\w+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+# In-process inverted index with Okapi BM25 scoring
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_lengths = {}
+        self.documents = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id: str, text: str, metadata: dict = None):
+        if doc_id in self.documents:
+            self.remove(doc_id)
+
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+        length = sum(counts.values())
+        self.doc_lengths[doc_id] = length
+        self.documents[doc_id] = (text, metadata or {})
+        self.total_length += length
+
+    def remove(self, doc_id: str):
+        if doc_id not in self.documents:
+            return
+
+        text, _ = self.documents.pop(doc_id)
+        for term in set(tokenize(text)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    # Return the k best (doc_id, score) pairs for a query. allowed restricts scoring
+    # to a set of doc ids; short postings are walked directly, long ones are probed
+    # with the allowed ids instead.
+    def search(self, query: str, k: int = 5, allowed: set[str] = None) -> list[tuple[str, float]]:
+        doc_count = len(self.doc_lengths)
+        if not doc_count:
+            return []
+
+        avg_length = self.total_length / doc_count
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+
+            idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+            if allowed is None:
+                matches = posting.items()
+            elif len(allowed) < len(posting):
+                matches = [(doc_id, posting[doc_id]) for doc_id in allowed if doc_id in posting]
+            else:
+                matches = [(doc_id, tf) for doc_id, tf in posting.items() if doc_id in allowed]
+            for doc_id, tf in matches:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(k, scores.items(), key=itemgetter(1))
+
+    def save(self, path: str):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        index = cls()
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                index.__dict__.update(pickle.load(f))
+        return index
+
+
+# Fuse several rankings of doc ids with reciprocal rank fusion
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[tuple[str, float]]:
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=itemgetter(1), reverse=True)
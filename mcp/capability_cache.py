@@ -0,0 +1,61 @@
+import os
+import re
+import json
+import logging
+
+from mcp.types import Tool, Prompt
+
+logger = logging.getLogger("document-search-client")
+
+# Listing kinds and the model of their items. Resources are not persisted: they follow
+# the server's document directories, which neither the version nor the stamp covers.
+CAPABILITY_MODELS = {"tools": Tool, "prompts": Prompt}
+
+
+# Tools and prompts of a server persisted as JSON, one file per server
+# name and version. The stamp (e.g. the server script mtime) invalidates entries of
+# servers that changed without a version bump.
+class CapabilityCache:
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def cache_path(self, server_name: str, server_version: str) -> str:
+        safe_name = re.sub(r"[^\w.-]", "_", f"{server_name}-{server_version}")
+        return os.path.join(self.cache_dir, f"{safe_name}.json")
+
+    # Cached listings as {kind: [model, ...]}, None when missing or stale
+    def load(self, server_name: str, server_version: str, stamp: str = None) -> dict | None:
+        try:
+            with open(self.cache_path(server_name, server_version), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if data.get("stamp") != stamp:
+            return None
+
+        try:
+            return {
+                kind: [model.model_validate(item) for item in data[kind]]
+                for kind, model in CAPABILITY_MODELS.items()
+            }
+        except Exception as ex:
+            logger.warning(f"Ignoring unreadable capability cache: {ex}")
+            return None
+
+    def save(self, server_name: str, server_version: str, listings: dict, stamp: str = None):
+        data = {
+            kind: [item.model_dump(mode="json", exclude_none=True) for item in listings.get(kind, [])]
+            for kind in CAPABILITY_MODELS
+        }
+        data["stamp"] = stamp
+
+        path = self.cache_path(server_name, server_version)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except OSError as ex:
+            logger.warning(f"Could not write capability cache {path}: {ex}")
@@ -0,0 +1,158 @@
+import os
+import re
+import zlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+import dotenv
+
+# numpy is imported lazily where it is used, it only matters here for annotations
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger("document-search-embedding")
+
+# Environment Variables
+dotenv.load_dotenv()
+
+# openai | onnx | sentence-transformers | hashing
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "512"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0")) or os.cpu_count() or 1
+
+TOKEN_PATTERN = re.compile(r"\w[\w\-\.]*")
+
+
+# Local embedder based on signed feature hashing of word unigrams and bigrams.
+# Needs no model files or network and embeds a whole batch with a few NumPy ops.
+# Inputs larger than one batch are embedded on up to num_threads threads.
+class HashingEmbeddingFunction:
+    def __init__(self, dim: int = EMBEDDING_DIM, batch_size: int = EMBEDDING_BATCH_SIZE, num_threads: int = EMBEDDING_THREADS):
+        self.dim = dim
+        self.batch_size = batch_size
+        self.num_threads = max(num_threads, 1)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @staticmethod
+    def name() -> str:
+        return "document-search-hashing"
+
+    def default_space(self) -> str:
+        return "cosine"
+
+    def get_config(self) -> dict:
+        return {"dim": self.dim, "batch_size": self.batch_size}
+
+    @staticmethod
+    def build_from_config(config: dict) -> "HashingEmbeddingFunction":
+        return HashingEmbeddingFunction(config.get("dim", EMBEDDING_DIM), config.get("batch_size", EMBEDDING_BATCH_SIZE))
+
+    def _features(self, text: str) -> list[int]:
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        features = [zlib.crc32(token.encode("utf-8")) for token in tokens]
+        features += [zlib.crc32(f"{a} {b}".encode("utf-8")) for a, b in zip(tokens, tokens[1:])]
+        return features
+
+    def _embed_batch(self, texts: list[str]) -> "np.ndarray":
+        import numpy as np
+
+        features = [self._features(text) for text in texts]
+        rows = np.repeat(np.arange(len(texts)), [len(f) for f in features])
+        hashes = np.fromiter((h for f in features for h in f), dtype=np.uint32, count=len(rows))
+
+        # Low bits pick the dimension, the top bit picks the sign
+        cols = (hashes % self.dim).astype(np.intp)
+        signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(matrix, (rows, cols), signs)
+
+        # Sublinear term frequency, then L2 normalization for cosine similarity
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.num_threads, thread_name_prefix="embedding")
+            return self._executor
+
+    def __call__(self, input: list[str]) -> list["np.ndarray"]:
+        batches = [input[start:start + self.batch_size] for start in range(0, len(input), self.batch_size)]
+        if self.num_threads > 1 and len(batches) > 1:
+            results = self._pool().map(self._embed_batch, batches)
+        else:
+            results = map(self._embed_batch, batches)
+
+        embeddings = []
+        for batch in results:
+            embeddings.extend(batch)
+        return embeddings
+
+
+# Local sentence-transformers model on CPU (optional dependency)
+class SentenceTransformerEmbeddingFunction:
+    def __init__(self, model_name: str = None, batch_size: int = EMBEDDING_BATCH_SIZE, num_threads: int = EMBEDDING_THREADS):
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ValueError("EMBEDDING_BACKEND=sentence-transformers requires the sentence-transformers package")
+
+        torch.set_num_threads(num_threads)
+        self.model_name = model_name or "all-MiniLM-L6-v2"
+        self.batch_size = batch_size
+        self._model = SentenceTransformer(self.model_name, device="cpu")
+
+    @staticmethod
+    def name() -> str:
+        return "document-search-sentence-transformers"
+
+    def default_space(self) -> str:
+        return "cosine"
+
+    def get_config(self) -> dict:
+        return {"model_name": self.model_name, "batch_size": self.batch_size}
+
+    @staticmethod
+    def build_from_config(config: dict) -> "SentenceTransformerEmbeddingFunction":
+        return SentenceTransformerEmbeddingFunction(config.get("model_name"), config.get("batch_size", EMBEDDING_BATCH_SIZE))
+
+    def __call__(self, input: list[str]) -> list["np.ndarray"]:
+        embeddings = self._model.encode(
+            list(input),
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        return list(embeddings)
+
+
+# Create the embedding function selected by EMBEDDING_BACKEND
+def create_embedding_function(backend: str = EMBEDDING_BACKEND):
+    if backend == "openai":
+        from chromadb.utils.embedding_functions import openai_embedding_function
+
+        return openai_embedding_function.OpenAIEmbeddingFunction(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            api_base=os.getenv("OPENAI_BASE_URL"),
+            model_name=EMBEDDING_MODEL or "text-embedding-3-small",
+        )
+    elif backend == "onnx":
+        from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+
+        os.environ.setdefault("OMP_NUM_THREADS", str(EMBEDDING_THREADS))
+        return ONNXMiniLM_L6_V2(preferred_providers=["CPUExecutionProvider"])
+    elif backend == "sentence-transformers":
+        return SentenceTransformerEmbeddingFunction(EMBEDDING_MODEL)
+    elif backend == "hashing":
+        return HashingEmbeddingFunction()
+    else:
+        raise ValueError(f"Unknown embedding backend: {backend}")
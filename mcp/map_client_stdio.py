@@ -3,13 +3,21 @@ import os
 import logging
 import json
 import sys
+import argparse
 from typing import Optional, List, Dict, Any
 from contextlib import AsyncExitStack
 
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from mcp import types
 
-from openai import OpenAI
+from capability_cache import CapabilityCache, CAPABILITY_MODELS
+from message_history import MessageHistory
+from server_pool import ServerPool
+from resource_cache import ResourceCache, conditional_uri
+from replay_load import load_script, replay, format_report
+
+from openai import AsyncOpenAI
 
 # logging
 logging.basicConfig(level=logging.INFO)
@@ -19,27 +27,70 @@ logger = logging.getLogger("document-search-client")
 logging.getLogger("openai").setLevel(logging.WARNING)
 logging.getLogger("https").setLevel(logging.WARNING)
 
+# Persistent cache of server tools and prompts
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CAPABILITY_CACHE_DIR = os.getenv("CAPABILITY_CACHE_DIR", os.path.join(BASE_DIR, "..", ".client_cache"))
+
+# Message history budget in bytes, HISTORY_MAX_TOKENS is converted at ~4 bytes per token
+HISTORY_MAX_BYTES = int(os.getenv("HISTORY_MAX_TOKENS", "0")) * 4 or int(os.getenv("HISTORY_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Resource texts cached by URI and revalidated with the server etag on every read
+RESOURCE_CACHE_BYTES = int(os.getenv("RESOURCE_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+# Number of server processes; above 1 requests are balanced across a pool of replicas
+SERVER_POOL_SIZE = int(os.getenv("SERVER_POOL_SIZE", "1"))
+SERVER_POOL_HEALTH_INTERVAL = float(os.getenv("SERVER_POOL_HEALTH_INTERVAL", "10"))
+
+# Model tool calling: every tool call gets its own timeout and at most
+# MAX_CONCURRENT_TOOL_CALLS calls of a session run at once
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+TOOL_CALL_TIMEOUT = float(os.getenv("TOOL_CALL_TIMEOUT", "60"))
+MAX_CONCURRENT_TOOL_CALLS = int(os.getenv("MAX_CONCURRENT_TOOL_CALLS", "4"))
+MAX_TOOL_ROUNDS = int(os.getenv("MAX_TOOL_ROUNDS", "5"))
+
+# Listing refreshed by each list_changed notification
+LIST_CHANGED_KINDS = {
+    types.ToolListChangedNotification: "tools",
+    types.ResourceListChangedNotification: "resources",
+    types.PromptListChangedNotification: "prompts",
+}
+
 # MCP Client
 class MCPClient:
-    def __init__(self, debug = False):
-        # Initialize session and client objects
-        self.session: Optional[ClientSession] = None
+    def __init__(self, debug = False, pool_size: int = None):
+        # Initialize session and client objects; in pool mode the session is a
+        # ServerPool that balances requests across server replicas
+        self.session: Optional[ClientSession | ServerPool] = None
         self.exit_stack = AsyncExitStack()
         self.debug = debug
+        self.pool_size = pool_size or SERVER_POOL_SIZE
+        self.pool: Optional[ServerPool] = None
 
-        # Message history tracking
-        self.message_history = []
+        # Message history tracking, bounded with resource bodies stored once
+        self.message_history = MessageHistory(HISTORY_MAX_BYTES)
 
         # Main system prompt
         self.system_prompt = "You are a helpful RAG AI assistant named 'RAG-AI-MCP' that can answer questions about the provided documents or query the attached databases for more information."
 
-        # Initialize OpenAI Client
-        
+        # Initialize OpenAI Client, created on the first query so that commands work without an API key
+        self.llm: Optional[AsyncOpenAI] = None
+        self.tool_semaphore = asyncio.Semaphore(MAX_CONCURRENT_TOOL_CALLS)
+
         # Server connection info
         self.avaliable_tools = []
         self.avaliable_resources = []
         self.avaliable_prompts = []
         self.server_name = None
+        self.server_version = None
+        self.server_capabilities = None
+        self.server_stamp = None
+        self.capability_cache = CapabilityCache(CAPABILITY_CACHE_DIR)
+
+        self.resource_cache = ResourceCache(RESOURCE_CACHE_BYTES)
+
+        # Refreshes started by server notifications
+        self.background_tasks = set()
+        self.pending_refreshes = set()
 
     # Connect to MCP Server
     async def connect_to_server(self, server_script_path: str):
@@ -59,41 +110,74 @@ class MCPClient:
 
         # Initialize stdio transport
         try:
-            stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
-            self.stdio, self.write = stdio_transport
-            self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
-
-            # Initialize the session
-            init_result = await self.session.initialize()
+            if self.pool_size > 1:
+                self.pool = ServerPool(server_params, self.pool_size, self.handle_server_message, SERVER_POOL_HEALTH_INTERVAL)
+                self.exit_stack.push_async_callback(self.pool.close)
+                init_result = await self.pool.start()
+                self.session = self.pool
+            else:
+                stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
+                self.stdio, self.write = stdio_transport
+                self.session = await self.exit_stack.enter_async_context(
+                    ClientSession(self.stdio, self.write, message_handler=self.handle_server_message)
+                )
+
+                # Initialize the session
+                init_result = await self.session.initialize()
             self.server_name = init_result.serverInfo.name
+            self.server_version = init_result.serverInfo.version
+            self.server_capabilities = init_result.capabilities
 
             if self.debug:
-                logger.info(f"Connected to server: {self.server_name} v{init_result.serverInfo.version}")
-
-            # Cache avaliable tools, resources and prompts
-            await self.refresh_capabilities()
+                logger.info(f"Connected to server: {self.server_name} v{self.server_version}")
+                if self.pool:
+                    logger.info(f"Server pool: {self.pool_size} replicas")
+
+            # Use the cached tools and prompts of this server version, the script mtime
+            # catches local edits made without a version bump. Resources are always listed:
+            # the server answers from its in-memory catalog, and the request also makes it
+            # track this session for resources/list_changed.
+            self.server_stamp = str(os.stat(server_script_path).st_mtime_ns)
+            cached = self.capability_cache.load(self.server_name, self.server_version, self.server_stamp)
+            if cached is not None:
+                self.avaliable_tools = cached["tools"]
+                self.avaliable_prompts = cached["prompts"]
+                if self.debug:
+                    logger.info("Loaded server tools and prompts from cache")
+                await self.refresh_capabilities(("resources",))
+            else:
+                await self.refresh_capabilities()
 
             return True
         except Exception as e:
             logger.error(f"Failed to connect to server: {e}")
             return False
         
-    # Refresh Server Capabilities
-    async def refresh_capabilities(self):
+    # Refresh Server Capabilities, the listings are requested concurrently and
+    # only for the capabilities the server advertises
+    async def refresh_capabilities(self, kinds: tuple[str, ...] = ("tools", "resources", "prompts")):
         if not self.session:
             raise ValueError(f"Not connected to server")
-        
-        # Get avaliable tools
-        tools_response = await self.session.list_tools()
-        self.avaliable_tools = tools_response.tools
 
-        # Get avaliable resources
-        resources_response = await self.session.list_resources()
-        self.avaliable_resources = resources_response.resources
+        listings = {
+            "tools": (self.session.list_tools, "tools"),
+            "resources": (self.session.list_resources, "resources"),
+            "prompts": (self.session.list_prompts, "prompts"),
+        }
+        kinds = [
+            kind for kind in kinds
+            if self.server_capabilities is None or getattr(self.server_capabilities, kind) is not None
+        ]
+        responses = await asyncio.gather(*(listings[kind][0]() for kind in kinds))
+
+        for kind, response in zip(kinds, responses):
+            setattr(self, f"avaliable_{kind}", getattr(response, listings[kind][1]))
 
-        # Get avaliable Prompts
-        prompts_response = await self.session.list_prompts()
-        self.avaliable_prompts = prompts_response.prompts
+        if any(kind in CAPABILITY_MODELS for kind in kinds):
+            self.capability_cache.save(self.server_name, self.server_version, {
+                "tools": self.avaliable_tools,
+                "prompts": self.avaliable_prompts,
+            }, self.server_stamp)
 
         if self.debug:
             logger.info(f"Server capabilities refreshed:")
@@ -101,28 +185,51 @@ class MCPClient:
             logger.info(f"- Resources: {len(self.avaliable_resources)}")
             logger.info(f"- Prompts: {len(self.avaliable_prompts)}")
 
+    # Refresh a cached listing when the server reports that it changed. The refresh runs
+    # as a task because the session only reads responses after this handler returns.
+    async def handle_server_message(self, message):
+        if not isinstance(message, types.ServerNotification):
+            return
+
+        kind = LIST_CHANGED_KINDS.get(type(message.root))
+        if kind is None or kind in self.pending_refreshes:
+            # Every pool replica reports the same change, one refresh is enough
+            return
+
+        if self.debug:
+            logger.info(f"Server {kind} changed, refreshing")
+
+        self.pending_refreshes.add(kind)
+        task = asyncio.create_task(self.refresh_capabilities((kind,)))
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        task.add_done_callback(lambda _: self.pending_refreshes.discard(kind))
+
     # Handling Message History Helper Function
     async def add_to_history(self, role: str, content: str, metadata: Dict[str, Any] = None):
-        message = {
-            "role": role,
-            "content": content,
-            "timestamp": asyncio.get_event_loop().time(),
-            "metadata": metadata or {}
-        }
-
         # Add mesage to history
-        self.message_history.append(message)
+        self.message_history.append(role, content, asyncio.get_event_loop().time(), metadata)
 
         if self.debug:
             logger.info(f"Added message to history: {role} - {content[:100]}...")
+            logger.info(f"History: {len(self.message_history)} messages, {self.message_history.size} bytes")
+
+    # Add resource content to history, stored once however often it is read
+    async def add_resource_to_history(self, role: str, uri: str, content: str, metadata: Dict[str, Any] = None):
+        self.message_history.append_resource(role, uri, content, asyncio.get_event_loop().time(), metadata)
 
-    # List avaliable resources from the mcp server
-    async def list_resources(self):
+        if self.debug:
+            logger.info(f"Added resource to history: {uri}")
+            logger.info(f"History: {len(self.message_history)} messages, {self.message_history.size} bytes")
+
+    # List avaliable resources from the mcp server, as listed on connect and kept
+    # current by list_changed notifications unless refresh is requested
+    async def list_resources(self, refresh: bool = False):
         if not self.session:
             raise ValueError("Not connected to server")
-        
-        response = await self.session.list_resources()
-        self.avaliable_resources = response.resources
+
+        if refresh:
+            await self.refresh_capabilities(("resources",))
 
         if self.debug:
             resource_uris = [res.uri for res in self.avaliable_resources]
@@ -136,16 +243,33 @@ class MCPClient:
             logger.info(f"Reading resource: {uri}")
 
         try:
-            result = await self.session.read_resource(uri)
+            # A cached copy is sent as a conditional read, an unchanged document costs
+            # a stat on the server instead of transferring its text again
+            cached = self.resource_cache.get(uri)
+            request_uri = conditional_uri(uri, cached[0]) if cached else uri
+            result = await self.session.read_resource(request_uri)
+
+            contents = result.contents if result else []
+            meta = (contents[0].meta or {}) if contents else {}
+            if cached and meta.get("not_modified") and meta.get("etag") == cached[0]:
+                content = cached[1]
+                self.resource_cache.record(True)
+            else:
+                content = "".join(item.text for item in contents if hasattr(item, "text"))
+                self.resource_cache.record(False)
+                if meta.get("etag"):
+                    self.resource_cache.set(uri, meta["etag"], content)
+                else:
+                    self.resource_cache.discard(uri)
+
+            if self.debug:
+                logger.info(f"Resource cache: {self.resource_cache.stats()}")
 
-            if not result:
+            if not content:
                 content = "No content found for this resource."
-            else:
-                content = result if isinstance(result, str) else str(result)
 
             # Add resource content to hsitory as a user message
-            resource_message = f"Resource content from {uri}: \n\n{content}"
-            await self.add_to_history("user", resource_message, {"resource_uri": uri, "is_resource": True})
+            await self.add_resource_to_history("user", uri, content, {"is_resource": True})
 
             return content
         except Exception as ex:
@@ -154,10 +278,10 @@ class MCPClient:
             await self.add_to_history("user", error_msg, {"uri": uri, "error": True})
             return error_msg
         
-    # List Avaliable Prompts from the MCP server
-    async def list_prompts(self):
-        response = await self.session.list_prompts()
-        self.avaliable_prompts = response.prompts
+    # List Avaliable Prompts from the MCP server, served from the capability cache
+    async def list_prompts(self, refresh: bool = False):
+        if refresh:
+            await self.refresh_capabilities(("prompts",))
 
         if self.debug:
             prompts_names = [prompt.name for prompt in self.avaliable_prompts]
@@ -178,6 +302,81 @@ class MCPClient:
             logger.error(error_msg)
             raise ValueError(error_msg)
     
+    # OpenAI function definitions of the server tools
+    def tool_definitions(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "type": "function",
+                "function": {
+                    "name": tool.name,
+                    "description": tool.description or "",
+                    "parameters": tool.inputSchema,
+                },
+            }
+            for tool in self.avaliable_tools
+        ]
+
+    # Run one tool call within the session's in-flight cap and its own timeout. A timed
+    # out call stops being awaited; the server bounds the work with its executor timeouts.
+    async def execute_tool_call(self, name: str, arguments: str | dict) -> str:
+        try:
+            if isinstance(arguments, str):
+                arguments = json.loads(arguments or "{}")
+        except ValueError as ex:
+            return f"Error: invalid arguments for tool {name}: {ex}"
+
+        if self.debug:
+            logger.info(f"Calling tool {name} with arguments: {arguments}")
+
+        async with self.tool_semaphore:
+            try:
+                result = await asyncio.wait_for(self.session.call_tool(name, arguments), TOOL_CALL_TIMEOUT)
+            except asyncio.TimeoutError:
+                return f"Error: tool {name} timed out after {TOOL_CALL_TIMEOUT}s"
+            except Exception as ex:
+                logger.error(f"Error calling tool {name}: {ex}")
+                return f"Error calling tool {name}: {str(ex)}"
+
+        text = "\n".join(content.text for content in result.content if hasattr(content, "text"))
+        return f"Error: {text}" if result.isError else text
+
+    # Run all tool calls of one model response concurrently, results keep the call order.
+    # Cancelling the turn cancels every call still in flight.
+    async def execute_tool_calls(self, tool_calls) -> List[str]:
+        return await asyncio.gather(*(
+            self.execute_tool_call(call.function.name, call.function.arguments)
+            for call in tool_calls
+        ))
+
+    # Answer a query with the model, running the tools it asks for
+    async def process_query(self, query: str) -> str:
+        if self.llm is None:
+            self.llm = AsyncOpenAI()
+
+        await self.add_to_history("user", query)
+        messages = [{"role": "system", "content": self.system_prompt}] + self.message_history.as_messages()
+        tools = self.tool_definitions()
+
+        for round_index in range(MAX_TOOL_ROUNDS + 1):
+            # The last round asks for an answer without further tool calls
+            options = {"tools": tools} if tools else {}
+            if tools and round_index == MAX_TOOL_ROUNDS:
+                options["tool_choice"] = "none"
+
+            response = await self.llm.chat.completions.create(model=OPENAI_MODEL, messages=messages, **options)
+            message = response.choices[0].message
+            if not message.tool_calls:
+                answer = message.content or ""
+                await self.add_to_history("assistant", answer)
+                return answer
+
+            messages.append(message.model_dump(exclude_none=True))
+            results = await self.execute_tool_calls(message.tool_calls)
+            for call, result in zip(message.tool_calls, results):
+                messages.append({"role": "tool", "tool_call_id": call.id, "content": result})
+
+        return ""
+
     # Main chat loop
     async def chat_loop(self):
         print(f"\n{'='*50}")
@@ -199,11 +398,11 @@ class MCPClient:
 
                 if query == '/quit':
                     break
-                elif query.lower == '/debug':
+                elif query.lower() == '/debug':
                     self.debug = not self.debug
                     print(f"\nDebug mode: {'enabled' if self.debug else 'disabled'}")
                     continue
-                elif query.lower() == 'refresh':
+                elif query.lower() == '/refresh':
                     await self.refresh_capabilities()
                     print("\nServer capabilities refreshed")
                     continue
@@ -276,8 +475,9 @@ class MCPClient:
                         print(f"    - {tool.name}")
                         if tool.description:
                             print(f"    {tool.description}")
-                
-                # TODO
+                elif query:
+                    response = await self.process_query(query)
+                    print(f"\n{response}")
 
             except Exception as ex:
                 print(f"\nError: {str(ex)}")
@@ -290,18 +490,32 @@ class MCPClient:
         if self.debug:
             logger.info("Cleaning up client resources")
         
-        await self.exit_stack.aclose()
+        # A late response to a timed out tool call can reach a transport that is shutting down
+        try:
+            await self.exit_stack.aclose()
+        except Exception as ex:
+            logger.warning(f"Error while closing the server connection: {ex}")
     
 
 # Main Function
 async def main():
-    if len(sys.argv) < 2:
-        print("Usage: python client.py <path_to_server_script>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="RAG-AI-MCP client, interactive or replaying a JSONL request script")
+    parser.add_argument("server_script", help="Path to the MCP server script")
+    parser.add_argument("--pool", type=int, default=None, help="Number of server replicas (default: SERVER_POOL_SIZE)")
+    parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    parser.add_argument("--replay", metavar="SCRIPT", help="Replay a JSONL script of tool calls, resource reads and prompts without the chat loop")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed", help="closed: workers wait for each response, open: requests start at --rate regardless")
+    parser.add_argument("--concurrency", type=int, default=1, help="Closed-loop workers, or open-loop cap on requests in flight (0: no cap)")
+    parser.add_argument("--rate", type=float, default=0.0, help="Requests per second across all workers (0: as fast as possible, closed-loop only)")
+    parser.add_argument("--iterations", type=int, default=1, help="Passes over the script")
+    parser.add_argument("--duration", type=float, default=0.0, help="Replay the script repeatedly for this many seconds instead")
+    parser.add_argument("--timeout", type=float, default=TOOL_CALL_TIMEOUT, help="Per-request timeout in seconds")
+    parser.add_argument("--report", metavar="PATH", help="Also write the replay report as JSON")
+    args = parser.parse_args()
 
     # Initialize client
-    server_script = sys.argv[1]
-    client = MCPClient()
+    server_script = args.server_script
+    client = MCPClient(debug=args.debug, pool_size=args.pool)
 
     # Connect to server
     try:
@@ -310,7 +524,18 @@ async def main():
             print(f"Failed to connect to server at {server_script}")
             sys.exit(1)
 
-        await client.chat_loop()
+        if args.replay:
+            entries = load_script(args.replay)
+            report = await replay(
+                client.session, entries, concurrency=args.concurrency, rate=args.rate, mode=args.mode,
+                iterations=args.iterations, duration=args.duration, timeout=args.timeout,
+            )
+            print(format_report(report))
+            if args.report:
+                with open(args.report, "w", encoding="utf-8") as f:
+                    json.dump(report, f, indent=2)
+        else:
+            await client.chat_loop()
 
     except Exception as ex:
         print(f"Error: {str(ex)}")
@@ -1,5 +1,14 @@
 import os
+import sys
+import time
+
+# Process start reference for the startup report
+STARTUP_STARTED = time.perf_counter()
+
+import json
+import asyncio
 import logging
+import weakref
 import dotenv
 from mcp.types import (
     Resource,
@@ -14,12 +23,21 @@ from mcp.types import (
 )
 from mcp.server import Server, NotificationOptions
 from mcp.server.models import InitializationOptions
+from mcp.server.lowlevel.helper_types import ReadResourceContents
 import mcp.server.stdio
-import chromadb
-from chromadb.utils.embedding_functions import openai_embedding_function
-import glob
 from importlib import metadata
-from langchain_community.document_loaders import PyPDFLoader
+from urllib.parse import urlsplit, parse_qs, urlencode
+from pdf_ingest import open_collection, ingest_documents, parse_pdf, PdfPageReader, BASE_DIR, COLLECTION_NAME, DOCUMENT_DIRS
+from page_cache import PageCache
+from resource_catalog import DocumentCatalog
+from blocking_executor import BlockingExecutor
+from snippets import extract_snippet
+from metadata_filter import build_filters
+import search_core
+from search_core import (
+    metrics, embedding_cache, result_cache, lexical_filter_cache, collection_version,
+    search_collection_batch, iter_hits, merge_hits, run_search, MMR_LAMBDA, SEARCH_MODES
+)
 
 # logging
 logging.basicConfig(level=logging.INFO)
@@ -31,26 +49,370 @@ dotenv.load_dotenv()
 # Initialize Server
 server = Server("document-search")
 
-# Initialize ChromaDB Client
-client = None
-embedding_function = None
-collection = None
+# Collection warm-up, started in the background so that initialize and
+# tools/list are answered without waiting for chromadb
+warm_up_task = None
+
+# Per-stage metrics logging, see get_server_metrics
+METRICS_LOG_INTERVAL = float(os.getenv("METRICS_LOG_INTERVAL", "0"))
+metrics_logger = logging.getLogger("document-search-metrics")
+
+# Import and startup timings, see --startup-report
+startup_report = {}
+
+# Thread pools for blocking work; searches and resource reads get separate
+# concurrency limits so slow PDF reads never hold up fast tool calls
+search_executor = BlockingExecutor(
+    "search",
+    max_workers=int(os.getenv("SEARCH_WORKERS", "4")),
+    max_concurrency=int(os.getenv("SEARCH_CONCURRENCY", "8")),
+    timeout=float(os.getenv("SEARCH_TIMEOUT", "30")),
+    metrics=metrics,
+)
+resource_executor = BlockingExecutor(
+    "resource",
+    max_workers=int(os.getenv("RESOURCE_WORKERS", "2")),
+    max_concurrency=int(os.getenv("RESOURCE_CONCURRENCY", "4")),
+    timeout=float(os.getenv("RESOURCE_TIMEOUT", "120")),
+    metrics=metrics,
+)
+
+# Parsed page text cache for resource reads
+PAGE_CACHE_DIR = os.getenv("PAGE_CACHE_DIR", os.path.join(BASE_DIR, "..", ".page_cache"))
+page_cache = PageCache(PAGE_CACHE_DIR)
+
+
+# Parse a PDF into page texts for the page cache
+def parse_pdf_pages(pdf_path: str) -> list[str]:
+    with metrics.timer("stage.pdf_parse"):
+        return [text for _, text in parse_pdf(pdf_path)]
+
+
+# Bounded chunk size for cursor-based resource reads
+RESOURCE_CHUNK_PAGES = int(os.getenv("RESOURCE_CHUNK_PAGES", "20"))
+RESOURCE_CHUNK_CHARS = int(os.getenv("RESOURCE_CHUNK_CHARS", "100000"))
+
+
+# Parse a page selection like "10-20" or "1-3,7" (1-based, inclusive) into page indexes
+def parse_page_ranges(spec: str, page_count: int) -> list[int]:
+    indexes = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        first = int(start) if start else 1
+        last = int(end) if end else (page_count if _ else first)
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid page range: {part}")
+        indexes.update(range(first - 1, min(last, page_count)))
+    return sorted(indexes)
+
+
+# Pages of a document, from the page cache when warm, otherwise extracted one by one from the PDF
+def open_document_pages(path: str):
+    document = page_cache.peek(path)
+    if document is not None:
+        metrics.count("page_cache.hit")
+        return document
+
+    metrics.count("page_cache.miss")
+    return PdfPageReader(path)
+
+
+def format_page(index: int, text: str) -> str:
+    return f"\n\n--- Page {index + 1} ---\n\n{text}"
 
-# Format search result helper function for query_document tool
-def format_search_result(document: str, distance: float, metadata: dict[str, object] = None) -> str:
-    result = f"Score: {1 - distance:.4f} (closer to 1 is better)\n"
 
+# Catalog of the documents served as resources, kept current by watch_catalog
+CATALOG_POLL_INTERVAL = float(os.getenv("CATALOG_POLL_INTERVAL", "5"))
+catalog = DocumentCatalog(DOCUMENT_DIRS)
+
+# Sessions that made a request and should hear about catalog changes; clients
+# with cached listings may never list resources themselves
+sessions = weakref.WeakSet()
+
+
+def track_session():
+    try:
+        sessions.add(server.request_context.session)
+    except LookupError:
+        pass
+
+
+# Find a PDF by name in the document catalog
+def resolve_document_path(document_name: str) -> str:
+    name = document_name[:-4] if document_name.endswith(".pdf") else document_name
+    path = catalog.path(name)
+    if path is None:
+        # The file may have been added since the last poll
+        catalog.refresh()
+        path = catalog.path(name)
+    if path is None:
+        raise FileNotFoundError(f"Document not found: {document_name}")
+    return path
+
+
+# Open the collection and load the lexical index in the background after startup
+async def warm_up():
+    started = time.perf_counter()
+    try:
+        await asyncio.to_thread(search_core.open_search_collection)
+    except Exception as ex:
+        logger.error(f"Error opening ChromaDB collection: {ex}")
+
+    startup_report["warm_up_seconds"] = round(time.perf_counter() - started, 4)
+    startup_report["ready_seconds"] = round(time.perf_counter() - STARTUP_STARTED, 4)
+    logger.info(f"Startup report: {json.dumps(startup_report)}")
+
+
+# Requests that need the collection wait for the warm-up to finish
+async def wait_for_warm_up():
+    if warm_up_task is not None:
+        await asyncio.shield(warm_up_task)
+
+
+# Measure the import cost of the lazily imported heavy dependencies and the collection open
+def measure_startup() -> dict:
+    import importlib
+
+    report = dict(startup_report)
+    imports = {}
+    for module in ("numpy", "chromadb", "pypdf", "langchain_community.document_loaders"):
+        started = time.perf_counter()
+        try:
+            importlib.import_module(module)
+            imports[module] = round(time.perf_counter() - started, 4)
+        except ImportError:
+            imports[module] = None
+    report["heavy_import_seconds"] = imports
+
+    started = time.perf_counter()
+    open_collection()
+    report["open_collection_seconds"] = round(time.perf_counter() - started, 4)
+    return report
+
+
+# Peak resident set size of the server process, None where the platform has no getrusage
+def peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+
+# Periodically write the metrics snapshot as one structured log line
+async def log_metrics():
+    while True:
+        await asyncio.sleep(METRICS_LOG_INTERVAL)
+        metrics_logger.info(json.dumps(metrics.snapshot()))
+
+
+# Poll the document directories and send resources/list_changed when the set of documents
+# changes. Reads refresh the catalog too, so changes are detected by the catalog generation
+# rather than by this poll's own refresh() result.
+async def watch_catalog():
+    notified_generation = catalog.generation
+    while True:
+        await asyncio.sleep(CATALOG_POLL_INTERVAL)
+        try:
+            await asyncio.to_thread(catalog.refresh)
+        except Exception as ex:
+            logger.error(f"Error scanning for PDF files: {ex}")
+            continue
+
+        if catalog.generation != notified_generation:
+            notified_generation = catalog.generation
+            logger.info(f"Document catalog changed, {len(catalog.paths)} document(s)")
+            for session in list(sessions):
+                try:
+                    await session.send_resource_list_changed()
+                except Exception as ex:
+                    logger.error(f"Error sending resource list changed notification: {ex}")
+
+
+# Response budget of the search tools in characters, 0 returns full contents.
+# max_tokens is converted with a rough characters per token estimate.
+SEARCH_MAX_CHARS = int(os.getenv("SEARCH_MAX_CHARS", "8000"))
+SNIPPET_MIN_CHARS = int(os.getenv("SNIPPET_MIN_CHARS", "200"))
+CHARS_PER_TOKEN = 4
+
+RESULT_SEPARATOR = "\n\n---\n\n"
+QUERY_SEPARATOR = "\n\n===\n\n"
+NO_QUERY_RESULTS = "No results found for this query."
+
+
+def response_budget(arguments: dict) -> int:
+    if arguments.get("max_tokens") is not None:
+        return max(int(arguments["max_tokens"]), 0) * CHARS_PER_TOKEN
+    return max(int(arguments.get("max_chars", SEARCH_MAX_CHARS)), 0)
+
+
+# Resource URI that returns the full page a search result came from;
+# page metadata is 0-based, the pages parameter is 1-based
+def content_reference(metadata: dict[str, object]) -> str | None:
+    if not metadata or not metadata.get('document') or metadata.get('page') is None:
+        return None
+    return f"document://pdf/{metadata['document']}?pages={int(metadata['page']) + 1}"
+
+
+# Title, score, page and (for snippets) reference lines of one result
+def result_header(title: str, score_text: str, metadata: dict[str, object] = None, reference: str = None) -> str:
+    result = f"{title}\nScore: {score_text}\n"
+
+    # 1-based like the pages parameter of document:// resources
     if metadata:
-        page_num = metadata.get('page', 'Unknown')
-        result += f"Page: {page_num}"
-        
-    result += f"Content: {document}"
+        page_num = int(metadata['page']) + 1 if metadata.get('page') is not None else 'Unknown'
+        if 'start_char' in metadata:
+            result += f"Page: {page_num} (chars {metadata['start_char']}-{metadata['end_char']})\n"
+        else:
+            result += f"Page: {page_num}\n"
+
+    if reference:
+        result += f"Full content: {reference}\n"
     return result
 
 
+# Format one search result; documents longer than snippet_chars are cut to a
+# query-focused snippet, the full content stays available through the resource
+def format_search_result(title: str, score_text: str, document: str, metadata: dict[str, object] = None,
+                         query_text: str = None, snippet_chars: int = 0) -> str:
+    if snippet_chars and len(document) > snippet_chars:
+        header = result_header(title, score_text, metadata, content_reference(metadata))
+        return f"{header}Snippet: {extract_snippet(document, query_text or '', snippet_chars)}"
+    return f"{result_header(title, score_text, metadata)}Content: {document}"
+
+
+# Snippet length of each result so that all of them fit in `available` characters,
+# None if one would get less than SNIPPET_MIN_CHARS. Results shorter than an equal
+# share are shown in full and leave their unused share to the longer ones.
+def allocate_snippets(results: list[tuple], available: int) -> list[int] | None:
+    full_sizes = [len(format_search_result(*result)) for result in results]
+    sizes = [0] * len(results)
+    remaining = available
+    left = len(results)
+    for i in sorted(range(len(results)), key=lambda i: full_sizes[i]):
+        share = remaining // left
+        left -= 1
+        if full_sizes[i] <= share:
+            remaining -= full_sizes[i]
+            continue
+
+        title, score_text, _, metadata, _ = results[i]
+        overhead = len(result_header(title, score_text, metadata, content_reference(metadata))) + len("Snippet: ")
+        sizes[i] = share - overhead
+        if sizes[i] < SNIPPET_MIN_CHARS:
+            return None
+        remaining -= overhead + sizes[i]
+    return sizes
+
+
+# Join (title, score_text, document, metadata, query_text) results within a character
+# budget, 0 returns full contents. Results that do not fit with a minimal snippet are
+# left out from the end and counted in a closing note.
+def fit_results(results: list[tuple], budget: int) -> str:
+    if not budget:
+        return RESULT_SEPARATOR.join(format_search_result(*result) for result in results)
+
+    for count in range(len(results), 0, -1):
+        omitted = len(results) - count
+        note = f"{RESULT_SEPARATOR}({omitted} more result(s) left out to fit the response budget)" if omitted else ""
+        sizes = allocate_snippets(results[:count], budget - len(RESULT_SEPARATOR) * (count - 1) - len(note))
+        if sizes is not None:
+            return RESULT_SEPARATOR.join(
+                format_search_result(*result, snippet_chars=size) for result, size in zip(results, sizes)
+            ) + note
+
+    # Not even the top result fits with a minimal snippet
+    return format_search_result(*results[0], snippet_chars=SNIPPET_MIN_CHARS)[:budget]
+
+
+def format_score(score: float, score_label: str = None) -> str:
+    if score_label:
+        return f"{score:.4f} ({score_label})"
+    return f"{1 - score:.4f} (closer to 1 is better)"
+
+
+# Format ranked hits within the budget; without a score label the score is a vector distance
+def format_hits(hits: list[tuple], score_label: str = None, query_text: str = None, budget: int = 0) -> str:
+    with metrics.timer("stage.format"):
+        return fit_results([
+            (f"Result {i+1}: ", format_score(score, score_label), doc, metadata, query_text)
+            for i, (doc_id, doc, score, metadata) in enumerate(hits)
+        ], budget)
+
+
+# Join the results of several queries, each under a "Query N:" header, within a character
+# budget, 0 returns full contents. Headers and empty-result lines are counted first and each
+# query with hits gets an equal share of what is left after the preceding ones. Queries
+# whose hits would not get a minimal snippet are left out from the end with a closing note.
+def fit_query_groups(groups: list[tuple[str, list[tuple]]], budget: int) -> str:
+    headers = [f"Query {i+1}: {query}{RESULT_SEPARATOR}" for i, (query, hits) in enumerate(groups)]
+    if not budget:
+        return QUERY_SEPARATOR.join(
+            header + (format_hits(hits, None, query) if hits else NO_QUERY_RESULTS)
+            for header, (query, hits) in zip(headers, groups)
+        )
+
+    for count in range(len(groups), 0, -1):
+        omitted = len(groups) - count
+        note = f"{QUERY_SEPARATOR}({omitted} more query(ies) left out to fit the response budget)" if omitted else ""
+        fixed = len(QUERY_SEPARATOR) * (count - 1) + len(note) + sum(map(len, headers[:count]))
+        fixed += sum(len(NO_QUERY_RESULTS) for _, hits in groups[:count] if not hits)
+        remaining = budget - fixed
+        left = sum(1 for _, hits in groups[:count] if hits)
+        if remaining < 0 or (left and remaining // left < SNIPPET_MIN_CHARS):
+            continue
+
+        parts = []
+        for header, (query, hits) in zip(headers[:count], groups[:count]):
+            if not hits:
+                parts.append(header + NO_QUERY_RESULTS)
+                continue
+            body = format_hits(hits, None, query, max(remaining // left, 1))
+            left -= 1
+            remaining -= len(body)
+            parts.append(header + body)
+        return QUERY_SEPARATOR.join(parts) + note
+
+    # Not even the first query fits with a minimal snippet
+    query, hits = groups[0]
+    body = format_hits(hits, None, query, SNIPPET_MIN_CHARS) if hits else NO_QUERY_RESULTS
+    return (headers[0] + body)[:budget]
+
+
+# Optional search filters, pushed down to Chroma as where/where_document clauses
+FILTER_PROPERTIES = {
+    "document": {
+        "anyOf": [{"type": "string"}, {"type": "array", "items": {"type": "string"}}],
+        "description": "Only search these documents, by name as listed in resources (e.g. ProfilingGuide)"
+    },
+    "page_from": {
+        "type": "integer",
+        "description": "Only search pages numbered at least this (1-based, as shown in results and resource URIs)"
+    },
+    "page_to": {
+        "type": "integer",
+        "description": "Only search pages numbered at most this (1-based, as shown in results and resource URIs)"
+    },
+    "metadata": {
+        "type": "object",
+        "description": "Extra matches on the stored metadata (page is 0-based there), {key: value} or {key: {\"$gte\": value}} with Chroma operators"
+    },
+    "contains": {
+        "type": "string",
+        "description": "Only search entries whose text contains this exact string"
+    },
+}
+
+
 # List avaliable tools in the server
 @server.list_tools()
 async def handle_list_tools() -> list[Tool]:
+    track_session()
     return [
         Tool(
             name="query_document",
@@ -65,11 +427,61 @@ async def handle_list_tools() -> list[Tool]:
                     "num_results": {
                         "type": "integer",
                         "description": "Number of results to return (default: 5)"
-                    }
+                    },
+                    "mmr_lambda": {
+                        "type": "number",
+                        "description": "Rerank for diversity with maximal marginal relevance, 1 is pure relevance, 0.5 balances relevance against repeated content (default: off)"
+                    },
+                    "mode": {
+                        "type": "string",
+                        "enum": ["vector", "lexical", "hybrid"],
+                        "description": "vector: semantic similarity, lexical: BM25 keyword match (best for CLI flags and metric names), hybrid: both fused by rank (default: vector)"
+                    },
+                    "max_chars": {
+                        "type": "integer",
+                        "description": f"Character budget of the whole response; longer results are cut to query-focused snippets with a document:// reference to the full page, 0 returns full contents (default: {SEARCH_MAX_CHARS})"
+                    },
+                    "max_tokens": {
+                        "type": "integer",
+                        "description": "Budget in approximate tokens, overrides max_chars"
+                    },
+                    **FILTER_PROPERTIES
                 },
                 "required": ["query_text"]
             }
         ),
+        Tool(
+            name="query_documents",
+            description="Search the document with several queries at once, e.g. different phrasings of the same question",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "queries": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "The search query texts"
+                    },
+                    "num_results": {
+                        "type": "integer",
+                        "description": "Number of results to return per query (default: 5)"
+                    },
+                    "merge": {
+                        "type": "boolean",
+                        "description": "Merge and de-duplicate the results of all queries into one ranked list (default: false)"
+                    },
+                    "max_chars": {
+                        "type": "integer",
+                        "description": f"Character budget of the whole response; longer results are cut to query-focused snippets with a document:// reference to the full page, 0 returns full contents (default: {SEARCH_MAX_CHARS})"
+                    },
+                    "max_tokens": {
+                        "type": "integer",
+                        "description": "Budget in approximate tokens, overrides max_chars"
+                    },
+                    **FILTER_PROPERTIES
+                },
+                "required": ["queries"]
+            }
+        ),
         Tool(
             name="get_collection_info",
             description="Get information about the ChromaDB collection",
@@ -78,66 +490,164 @@ async def handle_list_tools() -> list[Tool]:
                 "properties": {}
             }
         ),
+        Tool(
+            name="get_server_metrics",
+            description="Get per-stage latency histograms, call and error counters and cache statistics of this server",
+            inputSchema={
+                "type": "object",
+                "properties": {}
+            }
+        ),
     ]
 
 
+# Names of the tools and prompts this server serves. Metrics of any other name the
+# client sends are recorded as "unknown" so they cannot grow without bound.
+TOOL_NAMES = {"query_document", "query_documents", "get_collection_info", "get_server_metrics"}
+PROMPT_NAMES = {"deep_analysis", "extract_key_information"}
+
+
+def metric_name(name: str, known: set[str]) -> str:
+    return name if name in known else "unknown"
+
+
 # Handle tool execution requests
 @server.call_tool()
 async def handle_call_tool(name: str, arguments: dict | None) -> list[TextContent | ImageContent | EmbeddedResource]:
+    track_session()
+    label = metric_name(name, TOOL_NAMES)
+    metrics.count(f"calls.tool.{label}")
+    started = time.perf_counter()
+    try:
+        result = await call_tool(name, arguments or {})
+    except Exception as ex:
+        metrics.error(f"tool.{label}", ex)
+        raise
+    finally:
+        metrics.record(f"tool.{label}", time.perf_counter() - started)
+
+    # Response size stands in for the serialization cost paid by the SDK
+    metrics.count(f"response_chars.tool.{label}", sum(len(content.text) for content in result if hasattr(content, "text")))
+    return result
+
+
+async def call_tool(name: str, arguments: dict) -> list[TextContent | ImageContent | EmbeddedResource]:
+    await wait_for_warm_up()
+
     if name == "query_document":
         query_text = arguments.get("query_text", "")
         num_results = arguments.get("num_results", 5)
+        mode = arguments.get("mode", "vector")
 
         try:
-            if not collection:
+            budget = response_budget(arguments)
+            where, where_document = build_filters(arguments)
+            mmr_lambda = arguments.get("mmr_lambda", MMR_LAMBDA)
+            if mode not in SEARCH_MODES:
+                return [TextContent(type="text", text=f"Error: Unknown search mode: {mode}")]
+
+            if mmr_lambda is not None and not 0 <= float(mmr_lambda) <= 1:
+                return [TextContent(type="text", text="Error: mmr_lambda must be between 0 and 1")]
+
+            if not search_core.collection and (mode != "lexical" or mmr_lambda is not None):
                 return [TextContent(
                     type="text",
-                    text="Error: ChromaDB collection is not initialized. Please run chroma_setup.ipynb first."
+                    text="Error: ChromaDB collection is not initialized. Please run pdf_ingest.py first."
                 )]
-            
-            results = collection.query(
-                query_text=[query_text],
-                n_results = num_results
-            )
 
-            if not results or 'documents' not in results or not results['documents'][0]:
+            hits, score_label = await search_executor.run(
+                run_search, query_text, num_results, mode, where, where_document,
+                None if mmr_lambda is None else float(mmr_lambda)
+            )
+            if not hits:
                 return [TextContent(type="text", text="No results found for you query.")]
-            
-            formatted_result = []
-            for i, (doc, distance, metadata) in enumerate(zip(
-                results['documents'][0],
-                results['distances'][0],
-                results['metadatas'][0] if 'metadata' in results else [{}] * len(results['documents'[0]])
-            )):
-                formatted_result.append(f"Result {i+1}: \n{format_search_result(doc, distance, metadata)}")
 
             return [TextContent(
                 type="text",
-                text="\n\n---\n\n".join(formatted_result)
+                text=format_hits(hits, score_label, query_text, budget)
             )]
 
         except Exception as ex:
-            error_message = f"Error getting collection info: {str(ex)}"
+            metrics.error(f"tool.{name}", ex)
+            error_message = f"Error querying document: {str(ex)}"
             logger.error(error_message)
             return [TextContent(type="text", text=error_message)]
         
+    elif name == "query_documents":
+        queries = [query for query in arguments.get("queries", []) if query and query.strip()]
+        num_results = arguments.get("num_results", 5)
+        merge = arguments.get("merge", False)
+
+        try:
+            budget = response_budget(arguments)
+            where, where_document = build_filters(arguments)
+            if not search_core.collection:
+                return [TextContent(
+                    type="text",
+                    text="Error: ChromaDB collection is not initialized. Please run pdf_ingest.py first."
+                )]
+
+            if not queries:
+                return [TextContent(type="text", text="Error: At least one query is required.")]
+
+            results_list = await search_executor.run(search_collection_batch, queries, num_results, where, where_document)
+
+            if merge:
+                hits = merge_hits(results_list, num_results)
+                if not hits:
+                    return [TextContent(type="text", text="No results found for you queries.")]
+
+                with metrics.timer("stage.format"):
+                    text = fit_results([
+                        (f"Result {i+1} (queries: {', '.join(map(str, matched))}): ", format_score(distance), doc, metadata,
+                         " ".join(queries[query_number - 1] for query_number in matched))
+                        for i, (doc_id, doc, distance, metadata, matched) in enumerate(hits)
+                    ], budget)
+                return [TextContent(type="text", text=text)]
+
+            groups = [(query, iter_hits(results)) for query, results in zip(queries, results_list)]
+            return [TextContent(type="text", text=fit_query_groups(groups, budget))]
+
+        except Exception as ex:
+            metrics.error(f"tool.{name}", ex)
+            error_message = f"Error querying documents: {str(ex)}"
+            logger.error(error_message)
+            return [TextContent(type="text", text=error_message)]
+
     elif name == "get_collection_info":
         try:
-            if not collection:
+            if not search_core.collection:
                 return [TextContent(
                     type="text",
-                    text="Error: ChromaDB collection is not initialized. Please run chroma_setup.ipynb first."
+                    text="Error: ChromaDB collection is not initialized. Please run pdf_ingest.py first."
                 )]
             
-            count = collection.count()
+            count = await search_executor.run(search_core.collection.count)
             return [TextContent(
                     type="text",
-                    text=f"Collection name: pdf_collection\nNumber of documents: {count}"
+                    text=f"Collection name: {COLLECTION_NAME}\nNumber of documents: {count}\n"
+                         f"Embedding cache: {embedding_cache.stats()}\n"
+                         f"Result cache: {result_cache.stats()}"
                 )]
         except Exception as ex:
+            metrics.error(f"tool.{name}", ex)
             error_message = f"Error getting collection info: {str(ex)}"
             logger.error(error_message)
             return [TextContent(type="text", text=error_message)]
+
+    elif name == "get_server_metrics":
+        snapshot = metrics.snapshot()
+        snapshot["caches"] = {
+            "embedding": embedding_cache.stats(),
+            "result": result_cache.stats(),
+            "lexical_filter": lexical_filter_cache.stats(),
+        }
+        snapshot["executors"] = {
+            executor.name: {"in_flight": executor.in_flight, "max_concurrency": executor.max_concurrency}
+            for executor in (search_executor, resource_executor)
+        }
+        snapshot["peak_rss_mb"] = peak_rss_mb()
+        return [TextContent(type="text", text=json.dumps(snapshot, indent=2))]
     else:
         raise ValueError(f"Unknown tool: {name}")
 
@@ -146,70 +656,132 @@ async def handle_call_tool(name: str, arguments: dict | None) -> list[TextConten
 # List avaliable resources in the server
 @server.list_resources()
 async def handle_list_resource() -> list[Resource]:
-    resources = []
+    track_session()
 
     try:
-        pdf_files = glob.glob("../test/*.pdf")
-        for pdf_path in pdf_files:
-            filename = os.path.basename(pdf_path)
-            name_without_ext = os.path.splitext(filename)[0]
-
-            resources.append(
-                Resource(
-                    uri=f"document://pdf/{name_without_ext}",
-                    name=name_without_ext.replace('_', ' ').title(),
-                    description=f"PDF Document: {name_without_ext}",
-                    mimeType="application/pdf"
-                )
-            )
+        with metrics.timer("resource.list"):
+            # The first call scans the directories, keep that off the event loop
+            if not catalog.scanned:
+                return await resource_executor.run(catalog.list_resources)
+            return catalog.list_resources()
     except Exception as ex:
+        metrics.error("resource.list", ex)
         logger.error(f"Error scanning for PDF files: {ex}")
-
-    return resources
-
-
-# Handle reading PDF resources
+        return []
+
+
+# Load the text of a document resource, runs on the resource executor
+def load_document_text(document_name: str, path: str, params: dict[str, str]) -> str:
+    # Page range: extract only the requested pages
+    if "pages" in params:
+        document = open_document_pages(path)
+        indexes = parse_page_ranges(params["pages"], len(document))
+        text = "".join(format_page(i, document.page(i)) for i in indexes)
+
+        logger.info(f"Loaded {len(indexes)} page(s) of document {document_name}")
+        return text
+
+    # Cursor: stream the document in bounded chunks, the cursor is the next page number.
+    # The next cursor URI keeps the caller's limit and max_chars.
+    if "cursor" in params:
+        document = open_document_pages(path)
+        start = max(int(params["cursor"]) - 1, 0)
+        max_pages = int(params.get("limit", RESOURCE_CHUNK_PAGES))
+        max_chars = int(params.get("max_chars", RESOURCE_CHUNK_CHARS))
+        if max_pages < 1:
+            raise ValueError(f"Invalid limit: {max_pages}, must be at least 1")
+        if max_chars < 1:
+            raise ValueError(f"Invalid max_chars: {max_chars}, must be at least 1")
+
+        parts = []
+        chars = 0
+        index = start
+        while index < len(document) and index - start < max_pages:
+            page_text = format_page(index, document.page(index))
+            if parts and chars + len(page_text) > max_chars:
+                break
+            parts.append(page_text)
+            chars += len(page_text)
+            index += 1
+
+        if index < len(document):
+            next_params = {"cursor": index + 1}
+            next_params.update({key: params[key] for key in ("limit", "max_chars") if key in params})
+            parts.append(f"\n\n--- Next cursor: document://pdf/{document_name}?{urlencode(next_params)} ---\n")
+
+        logger.info(f"Loaded pages {start + 1}-{index} of document {document_name}")
+        return "".join(parts)
+
+    # Load the document pages, parsing the PDF only if the page cache is stale
+    document = page_cache.peek(path)
+    metrics.count("page_cache.hit" if document is not None else "page_cache.miss")
+    if document is None:
+        document = page_cache.get(path, parse_pdf_pages)
+
+    # Combine all pages into one text with page markers
+    full_text = "".join(format_page(i, page_text) for i, page_text in document.pages())
+
+    logger.info(f"Loaded document {document_name} with {len(document)} pages, Preview: {full_text[:200]}...")
+    return full_text
+
+
+# Version of a document's content for client caches, changes whenever the PDF is rewritten
+def document_etag(path: str) -> str:
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+# Resolve, stat and (unless the client's copy is current) load a document; the catalog
+# may rescan the directories, so this runs on the resource executor with the load.
+# Returns the etag and the text, None when if_none_match matches the etag.
+def read_document(document_name: str, params: dict[str, str]) -> tuple[str, str | None]:
+    path = resolve_document_path(document_name)
+    etag = document_etag(path)
+    if params.pop("if_none_match", None) == etag:
+        return etag, None
+    return etag, load_document_text(document_name, path, params)
+
+
+# Handle reading PDF resources. Contents carry the document etag in _meta; a read with
+# if_none_match=<etag> for an unchanged document returns an empty not_modified reply.
 @server.read_resource()
 async def handle_read_resource(uri: str):
+    track_session()
     if not str(uri).startswith("document://"):
         raise ValueError(f"Unsupported URI scheme: {uri}")
     
-    path_parts = str(uri).split("/")
-    if len(path_parts) < 4:
+    parsed_uri = urlsplit(str(uri))
+    if not parsed_uri.netloc or not parsed_uri.path.strip("/"):
         raise ValueError(f"Invalie URI format: {uri}")
     
-    resouce_type = path_parts[2]
+    resouce_type = parsed_uri.netloc
     if resouce_type != "pdf":
         raise ValueError(f"Unsupported resource type: {resouce_type}")
     
-    document_name = path_parts[3]
+    document_name = parsed_uri.path.strip("/")
+    params = {key: values[-1] for key, values in parse_qs(parsed_uri.query).items()}
 
+    metrics.count("calls.resource.read")
     try:
-        path = f"../test/{document_name}"
-        if not path.endswith(".pdf"):
-            path += ".pdf"
-
-        # Load the document
-        loader = PyPDFLoader(path)
-        pages = loader.load()
-
-        # Combine all pages into one text with page markers
-        full_text = ""
-        for i, page in enumerate(pages):
-            full_text += f"\n\n--- Page (i + 1) ---\n\n"
-            full_text += page.page_content
-
-        logger.info(f"Loaded document {document_name} with {len(pages)} pages, Preview: {full_text[:200]}...")
-        return full_text
+        with metrics.timer("resource.read"):
+            etag, text = await resource_executor.run(read_document, document_name, params)
+        if text is None:
+            metrics.count("resource.not_modified")
+            return [ReadResourceContents("", "text/plain", {"etag": etag, "not_modified": True})]
+
+        metrics.count("response_chars.resource.read", len(text))
+        return [ReadResourceContents(text, "text/plain", {"etag": etag})]
     except Exception as ex:
+        metrics.error("resource.read", ex)
         error_message = f"Error loading document: {str(ex)}"
         logger.error(error_message)
-        return error_message
+        return [ReadResourceContents(error_message, "text/plain")]
     
 
 # List avaliable prompts in the server
 @server.list_prompts()
 async def handle_list_prompts() -> list[Prompt]:
+    track_session()
     return [
         Prompt(
             name="deep_analysis",
@@ -239,14 +811,25 @@ async def handle_list_prompts() -> list[Prompt]:
 # Handle prompt execution requires
 @server.get_prompt()
 async def handle_get_prompt(name: str, arguments: dict[str, str] | None) -> GetPromptResult:
+    track_session()
+    label = metric_name(name, PROMPT_NAMES)
+    metrics.count(f"calls.prompt.{label}")
+    try:
+        with metrics.timer(f"prompt.{label}"):
+            return await get_prompt(name, arguments)
+    except Exception as ex:
+        metrics.error(f"prompt.{label}", ex)
+        raise
+
+
+async def get_prompt(name: str, arguments: dict[str, str] | None) -> GetPromptResult:
     if arguments is None:
         arguments = {}
 
     
     if name =="deep_analysis":
-        print(f"mcp server: {name}, {arguments}")
         query = arguments.get("query", "main themes")
-        print(f"mcp server: {name}, {query}")
+        logger.debug(f"Getting prompt {name}: {query}")
 
         return GetPromptResult(
             description=f"Deep analysis focusing on {query}",
@@ -310,30 +893,57 @@ async def handle_get_prompt(name: str, arguments: dict[str, str] | None) -> GetP
         raise ValueError(f"Unknown prompt: {name}")
 
 
+startup_report["import_seconds"] = round(time.perf_counter() - STARTUP_STARTED, 4)
+
+
 # Run the mcp server using stdio/stdout streams
 async def main():
+    global warm_up_task
+
     try:
         dist = metadata.distribution("document-search-mcp")
         version = dist.version
     except:
         version = "0.1.0"
 
-    async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            InitializationOptions(
-                server_name="document-search-mcp",
-                server_version=version,
-                capabilities=server.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={},
+    warm_up_task = asyncio.create_task(warm_up())
+    watch_task = asyncio.create_task(watch_catalog()) if CATALOG_POLL_INTERVAL > 0 else None
+    metrics_task = asyncio.create_task(log_metrics()) if METRICS_LOG_INTERVAL > 0 else None
+
+    try:
+        async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                InitializationOptions(
+                    server_name="document-search-mcp",
+                    server_version=version,
+                    capabilities=server.get_capabilities(
+                        notification_options=NotificationOptions(resources_changed=True),
+                        experimental_capabilities={},
+                    )
                 )
             )
-        )
+    finally:
+        if watch_task:
+            watch_task.cancel()
+        if metrics_task:
+            metrics_task.cancel()
+        search_executor.shutdown()
+        resource_executor.shutdown()
 
 
 # Main Function
 if __name__ == "__main__":
-    import asyncio
+    if "--startup-report" in sys.argv:
+        print(json.dumps(measure_startup(), indent=2))
+        sys.exit(0)
+
+    # Startup mode: bring the index up to date before serving
+    if "--ingest" in sys.argv or os.getenv("INGEST_ON_STARTUP", "").lower() in ("1", "true", "yes"):
+        search_core.open_search_collection()
+        ingest_documents(search_core.collection, search_core.embedding_function)
+        collection_version.bump()
+        result_cache.clear()
+
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,133 @@
+import hashlib
+from collections import deque
+
+
+# One history entry. Resource bodies live in the ContentStore and are referenced by key.
+class HistoryMessage:
+    __slots__ = ("role", "content", "timestamp", "metadata", "content_key", "size")
+
+    def __init__(self, role: str, content: str | None, timestamp: float, metadata: dict = None,
+                 content_key: str = None, size: int = 0):
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp
+        self.metadata = metadata
+        self.content_key = content_key
+        self.size = size
+
+
+# Content-addressed text bodies with reference counts; a document read twice is stored once
+class ContentStore:
+    def __init__(self):
+        self.blobs = {}
+        self.size = 0
+
+    def put(self, text: str) -> str:
+        data = text.encode("utf-8")
+        key = hashlib.sha256(data).hexdigest()
+        entry = self.blobs.get(key)
+        if entry is None:
+            self.blobs[key] = [text, 1, len(data)]
+            self.size += len(data)
+        else:
+            entry[1] += 1
+        return key
+
+    def get(self, key: str) -> str:
+        return self.blobs[key][0]
+
+    def release(self, key: str):
+        entry = self.blobs.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self.blobs[key]
+            self.size -= entry[2]
+
+
+# Message history bounded by a byte budget. Oldest turns are evicted first and
+# replaced by one short note listing what was dropped; the newest message is kept
+# even when it alone exceeds the budget.
+class MessageHistory:
+    def __init__(self, max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.messages = deque()
+        self.store = ContentStore()
+        self.inline_size = 0
+        self.evicted = 0
+        self.evicted_resources = {}
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    @property
+    def size(self) -> int:
+        return self.inline_size + self.store.size
+
+    def append(self, role: str, content: str, timestamp: float, metadata: dict = None) -> HistoryMessage:
+        message = HistoryMessage(role, content, timestamp, metadata or None, size=len(content.encode("utf-8")))
+        self.messages.append(message)
+        self.inline_size += message.size
+        self.evict()
+        return message
+
+    # Resource text is stored once; re-reading the same content moves the reference to the end
+    def append_resource(self, role: str, uri: str, content: str, timestamp: float, metadata: dict = None) -> HistoryMessage:
+        key = self.store.put(content)
+        self.evicted_resources.pop(uri, None)
+        for message in [m for m in self.messages if m.content_key == key]:
+            self.remove(message)
+
+        message = HistoryMessage(role, None, timestamp, {**(metadata or {}), "resource_uri": uri}, content_key=key)
+        self.messages.append(message)
+        self.evict()
+        return message
+
+    def remove(self, message: HistoryMessage):
+        self.messages.remove(message)
+        self._release(message)
+
+    def _release(self, message: HistoryMessage):
+        if message.content_key is not None:
+            self.store.release(message.content_key)
+        else:
+            self.inline_size -= message.size
+
+    def evict(self):
+        if not self.max_bytes:
+            return
+
+        while self.size > self.max_bytes and len(self.messages) > 1:
+            message = self.messages.popleft()
+            self._release(message)
+            self.evicted += 1
+            if message.content_key is not None:
+                self.evicted_resources[message.metadata["resource_uri"]] = None
+
+    def text(self, message: HistoryMessage) -> str:
+        if message.content_key is None:
+            return message.content
+        return f"Resource content from {message.metadata['resource_uri']}: \n\n{self.store.get(message.content_key)}"
+
+    # Chat messages for the model, prefixed by a note on evicted turns
+    def as_messages(self) -> list[dict]:
+        messages = []
+        if self.evicted:
+            note = f"[{self.evicted} earlier message(s) were dropped from the history to stay within its size limit"
+            if self.evicted_resources:
+                note += f"; dropped resources can be read again: {', '.join(self.evicted_resources)}"
+            messages.append({"role": "user", "content": note + "]"})
+
+        messages.extend({"role": message.role, "content": self.text(message)} for message in self.messages)
+        return messages
+
+    def clear(self):
+        self.messages.clear()
+        self.store = ContentStore()
+        self.inline_size = 0
+        self.evicted = 0
+        self.evicted_resources = {}
@@ -0,0 +1,91 @@
+import operator
+
+# Chroma metadata operators, also evaluated in-process for the lexical index
+COMPARISONS = {
+    "$eq": operator.eq,
+    "$ne": operator.ne,
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+    "$in": lambda value, options: value in options,
+    "$nin": lambda value, options: value not in options,
+}
+
+# Tool arguments that map onto the metadata written by pdf_ingest
+FILTER_ARGUMENTS = ("document", "page_from", "page_to", "metadata", "contains")
+
+
+def _clause(key: str, value) -> dict:
+    if isinstance(value, dict):
+        unknown = [op for op in value if op not in COMPARISONS]
+        if unknown:
+            raise ValueError(f"Unsupported filter operator for {key}: {', '.join(unknown)}")
+        return {key: value}
+    if isinstance(value, list):
+        return {key: {"$in": value}}
+    return {key: value}
+
+
+# Build Chroma where and where_document clauses from the search tool arguments.
+# document accepts one name or a list, page_from/page_to bound the 1-based page
+# numbers shown in results and resource URIs (the page metadata is 0-based),
+# metadata holds extra {key: value or {operator: value}} matches on stored values.
+def build_filters(arguments: dict) -> tuple[dict | None, dict | None]:
+    clauses = []
+
+    document = arguments.get("document")
+    if document:
+        names = document if isinstance(document, list) else [document]
+        names = [name[:-4] if name.endswith(".pdf") else name for name in names]
+        clauses.append(_clause("document", names if len(names) > 1 else names[0]))
+
+    if arguments.get("page_from") is not None:
+        clauses.append({"page": {"$gte": int(arguments["page_from"]) - 1}})
+    if arguments.get("page_to") is not None:
+        clauses.append({"page": {"$lte": int(arguments["page_to"]) - 1}})
+
+    for key, value in (arguments.get("metadata") or {}).items():
+        clauses.append(_clause(key, value))
+
+    where = None
+    if len(clauses) == 1:
+        where = clauses[0]
+    elif clauses:
+        where = {"$and": clauses}
+
+    where_document = {"$contains": arguments["contains"]} if arguments.get("contains") else None
+    return where, where_document
+
+
+# Evaluate a where clause against one metadata dict, as Chroma would
+def matches_where(metadata: dict, where: dict | None) -> bool:
+    if not where:
+        return True
+
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            if key not in metadata:
+                return False
+            for op, expected in condition.items():
+                if not COMPARISONS[op](metadata[key], expected):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def matches_where_document(text: str, where_document: dict | None) -> bool:
+    if not where_document:
+        return True
+    if "$contains" in where_document:
+        return where_document["$contains"] in text
+    if "$not_contains" in where_document:
+        return where_document["$not_contains"] not in text
+    raise ValueError(f"Unsupported document filter: {where_document}")
@@ -0,0 +1,152 @@
+import os
+import mmap
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+
+logger = logging.getLogger("document-search-page-cache")
+
+# Cache file layout:
+#   header   magic, source size, source mtime_ns, page count
+#   offsets  page count + 1 unsigned 64-bit offsets into the text blob
+#   text     UTF-8 text of all pages, back to back
+HEADER = struct.Struct("=4sQqI")
+MAGIC = b"PGC1"
+OFFSET_SIZE = array("Q").itemsize
+
+
+# Parsed page text of one PDF, served from a memory-mapped cache file
+class PagedDocument:
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+        with open(cache_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.source_size, self.source_mtime_ns, self.page_count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"Not a page cache file: {cache_path}")
+
+        offsets_end = HEADER.size + (self.page_count + 1) * OFFSET_SIZE
+        self._offsets = array("Q")
+        self._offsets.frombytes(self._mm[HEADER.size:offsets_end])
+        self._text_start = offsets_end
+
+    def __len__(self):
+        return self.page_count
+
+    def page(self, index: int) -> str:
+        start = self._text_start + self._offsets[index]
+        end = self._text_start + self._offsets[index + 1]
+        return self._mm[start:end].decode("utf-8")
+
+    def pages(self, start: int = 0, end: int = None):
+        end = self.page_count if end is None else min(end, self.page_count)
+        for index in range(max(start, 0), end):
+            yield index, self.page(index)
+
+    def matches(self, stat: os.stat_result) -> bool:
+        return self.source_size == stat.st_size and self.source_mtime_ns == stat.st_mtime_ns
+
+    def close(self):
+        self._mm.close()
+
+
+# On-disk cache of parsed PDF page text keyed by path, size and mtime
+class PageCache:
+    def __init__(self, cache_dir: str, max_open: int = 32):
+        self.cache_dir = cache_dir
+        self.max_open = max_open
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+        # One lock per PDF so that only one thread parses and stores a cold document
+        self._path_locks = {}
+
+    def cache_path(self, pdf_path: str) -> str:
+        digest = hashlib.sha1(os.path.abspath(pdf_path).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.pages")
+
+    # Write the page texts of a PDF to its cache file
+    def store(self, pdf_path: str, stat: os.stat_result, pages: list[str]) -> str:
+        encoded = [text.encode("utf-8") for text in pages]
+        offsets = array("Q", [0])
+        for data in encoded:
+            offsets.append(offsets[-1] + len(data))
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cache_path = self.cache_path(pdf_path)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(HEADER.pack(MAGIC, stat.st_size, stat.st_mtime_ns, len(encoded)))
+                f.write(offsets.tobytes())
+                f.writelines(encoded)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return cache_path
+
+    # Return the cached pages of a PDF if the cache is fresh, otherwise None
+    def peek(self, pdf_path: str) -> PagedDocument | None:
+        pdf_path = os.path.abspath(pdf_path)
+        stat = os.stat(pdf_path)
+
+        with self._lock:
+            document = self._open.get(pdf_path)
+            if document is not None and document.matches(stat):
+                self._open.move_to_end(pdf_path)
+                return document
+
+        cache_path = self.cache_path(pdf_path)
+        if not os.path.exists(cache_path):
+            return None
+
+        try:
+            document = PagedDocument(cache_path)
+        except Exception as ex:
+            logger.error(f"Discarding unreadable page cache {cache_path}: {ex}")
+            return None
+
+        if not document.matches(stat):
+            document.close()
+            return None
+
+        self._remember(pdf_path, document)
+        return document
+
+    # Return the cached pages of a PDF, parsing it with `parse` only when the cache is stale
+    def get(self, pdf_path: str, parse) -> PagedDocument:
+        pdf_path = os.path.abspath(pdf_path)
+        document = self.peek(pdf_path)
+        if document is not None:
+            return document
+
+        with self._path_lock(pdf_path):
+            # Another thread may have filled the cache while this one waited
+            document = self.peek(pdf_path)
+            if document is not None:
+                return document
+
+            stat = os.stat(pdf_path)
+            cache_path = self.store(pdf_path, stat, parse(pdf_path))
+            document = PagedDocument(cache_path)
+            self._remember(pdf_path, document)
+            return document
+
+    def _path_lock(self, pdf_path: str) -> threading.Lock:
+        with self._lock:
+            return self._path_locks.setdefault(pdf_path, threading.Lock())
+
+    def _remember(self, pdf_path: str, document: PagedDocument):
+        with self._lock:
+            self._open.pop(pdf_path, None)
+            self._open[pdf_path] = document
+            # Old mappings are left to the garbage collector since a reader may still hold them
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
@@ -0,0 +1,318 @@
+import os
+import sys
+import json
+import glob
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import dotenv
+
+from embedding_backend import create_embedding_function, EMBEDDING_BACKEND, EMBEDDING_BATCH_SIZE
+from bm25_index import BM25Index
+from text_chunker import iter_chunks
+
+# logging
+logger = logging.getLogger("document-search-ingest")
+
+# Environment Variables
+dotenv.load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CHROMA_PATH = os.getenv("CHROMA_PATH", os.path.join(BASE_DIR, "..", "chroma_db"))
+COLLECTION_NAME = os.getenv("CHROMA_COLLECTION", "pdf_collection")
+DOCUMENT_DIRS = [d for d in os.getenv("DOCUMENT_DIRS", os.path.join(BASE_DIR, "..", "data")).split(os.pathsep) if d]
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count() or 1
+
+# Retrieval units: overlapping chunks of CHUNK_SIZE chars or tokens, 0 keeps whole pages
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+CHUNK_UNIT = os.getenv("CHUNK_UNIT", "chars")
+
+MANIFEST_NAME = "ingest_manifest.json"
+LEXICAL_INDEX_NAME = "bm25_index.pkl"
+
+
+# Open (or create) the persistent Chroma collection used by the server
+def open_collection(path: str = CHROMA_PATH, name: str = COLLECTION_NAME):
+    import chromadb
+
+    client = chromadb.PersistentClient(path=path)
+    embedding_function = create_embedding_function()
+    collection = client.get_or_create_collection(
+        name=name,
+        embedding_function=embedding_function,
+        metadata={"embedding_backend": EMBEDDING_BACKEND, "hnsw:space": "cosine"},
+    )
+
+    # Vectors from different backends are not comparable
+    indexed_backend = (collection.metadata or {}).get("embedding_backend")
+    if indexed_backend and indexed_backend != EMBEDDING_BACKEND:
+        logger.error(f"Collection {name} was indexed with embedding backend {indexed_backend}, "
+                     f"but EMBEDDING_BACKEND is {EMBEDDING_BACKEND}. Use another CHROMA_PATH or re-ingest with --force.")
+
+    return client, embedding_function, collection
+
+
+# File name without .pdf, the document key of indexes built before keys were path based
+def document_name(pdf_path: str) -> str:
+    return os.path.splitext(os.path.basename(pdf_path))[0]
+
+
+# Key prefix of each document directory: none with a single directory, else its
+# base name, numbered when several directories share one
+def document_dir_labels(dirs: list[str]) -> list[str]:
+    if len(dirs) == 1:
+        return [""]
+    names = [os.path.basename(os.path.normpath(d)) or "root" for d in dirs]
+    return [name if names.count(name) == 1 else f"{name}-{i + 1}" for i, name in enumerate(names)]
+
+
+# Unique document key used for ids, the document metadata and document:// URIs: the
+# path relative to the first document directory holding the file, without .pdf
+def document_key(pdf_path: str, dirs: list[str], labels: list[str] = None) -> str:
+    pdf_path = os.path.abspath(pdf_path)
+    for directory, label in zip(dirs, labels or document_dir_labels(dirs)):
+        directory = os.path.abspath(directory)
+        if pdf_path.startswith(directory + os.sep):
+            relative = os.path.splitext(os.path.relpath(pdf_path, directory))[0].replace(os.sep, "/")
+            return f"{label}/{relative}" if label else relative
+    return document_name(pdf_path)
+
+
+# Find every PDF under the configured document directories
+def discover_pdfs(dirs: list[str]) -> list[str]:
+    pdf_files = set()
+    for directory in dirs:
+        for pdf_path in glob.glob(os.path.join(directory, "**", "*.pdf"), recursive=True):
+            pdf_files.add(os.path.abspath(pdf_path))
+    return sorted(pdf_files)
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# The manifest records what has been indexed so restarts only touch changed files
+def load_manifest(path: str = CHROMA_PATH) -> dict:
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {"files": {}}
+
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as ex:
+        logger.error(f"Ignoring unreadable ingest manifest {manifest_path}: {ex}")
+        return {"files": {}}
+
+
+def save_manifest(manifest: dict, path: str = CHROMA_PATH):
+    os.makedirs(path, exist_ok=True)
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+# Parse a PDF into (page number, text) pairs, runs inside the worker processes
+def parse_pdf(pdf_path: str) -> list[tuple[int, str]]:
+    from langchain_community.document_loaders import PyPDFLoader
+
+    pages = PyPDFLoader(pdf_path).load()
+    return [(page.metadata.get("page", i), page.page_content) for i, page in enumerate(pages)]
+
+
+# Random access to single pages of a PDF without parsing the whole document
+class PdfPageReader:
+    def __init__(self, pdf_path: str):
+        from pypdf import PdfReader
+
+        self._reader = PdfReader(pdf_path)
+
+    def __len__(self):
+        return len(self._reader.pages)
+
+    def page(self, index: int) -> str:
+        return self._reader.pages[index].extract_text()
+
+
+# Embed a batch of pages with one embedding call and bulk-upsert it
+def _flush(collection, embedding_function, batch: list[tuple[str, str, dict]]):
+    if not batch:
+        return
+
+    ids = [record[0] for record in batch]
+    documents = [record[1] for record in batch]
+    metadatas = [record[2] for record in batch]
+    embeddings = embedding_function(documents)
+    collection.upsert(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+
+
+# Incrementally index PDFs: parse in a process pool, embed and upsert in large batches
+def ingest_documents(collection, embedding_function, dirs: list[str] = None, workers: int = None,
+                     batch_size: int = None, force: bool = False, chroma_path: str = CHROMA_PATH,
+                     chunk_size: int = None, chunk_overlap: int = None, chunk_unit: str = None) -> dict:
+    dirs = dirs or DOCUMENT_DIRS
+    workers = workers or INGEST_WORKERS
+    batch_size = batch_size or EMBEDDING_BATCH_SIZE
+    chunking = {
+        "size": CHUNK_SIZE if chunk_size is None else chunk_size,
+        "overlap": CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap,
+        "unit": chunk_unit or CHUNK_UNIT,
+    }
+    if chunking["unit"] not in ("chars", "tokens"):
+        raise ValueError(f"Unknown chunk unit: {chunking['unit']}")
+    if chunking["size"] > 0 and chunking["overlap"] >= chunking["size"]:
+        raise ValueError("Chunk overlap must be smaller than the chunk size")
+
+    manifest = load_manifest(chroma_path)
+    indexed = manifest.setdefault("files", {})
+
+    # Ids and offsets depend on the chunking, so a new configuration re-indexes everything
+    if indexed and manifest.get("chunking", {"size": 0, "overlap": 0, "unit": "chars"}) != chunking:
+        logger.info(f"Chunking changed to {chunking}, re-indexing all files")
+        force = True
+    manifest["chunking"] = chunking
+
+    # The lexical index is built from the same page documents; rebuild everything if it is missing
+    lexical_index_path = os.path.join(chroma_path, LEXICAL_INDEX_NAME)
+    if indexed and not os.path.exists(lexical_index_path):
+        logger.info("Lexical index missing, re-indexing all files")
+        force = True
+    lexical_index = BM25Index.load(lexical_index_path)
+    stats = {"scanned": 0, "indexed": 0, "unchanged": 0, "removed": 0, "failed": 0, "pages": 0, "chunks": 0}
+
+    # Work out which files changed since the last run
+    pending = []
+    pdf_files = discover_pdfs(dirs)
+    labels = document_dir_labels(dirs)
+    keys = {pdf_path: document_key(pdf_path, dirs, labels) for pdf_path in pdf_files}
+    for pdf_path in pdf_files:
+        stats["scanned"] += 1
+        stat = os.stat(pdf_path)
+        entry = indexed.get(pdf_path)
+
+        # A file whose key changed (the document directories were reconfigured) is re-indexed
+        if entry and entry.get("document", document_name(pdf_path)) != keys[pdf_path]:
+            entry = None
+
+        if not force and entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            stats["unchanged"] += 1
+            continue
+
+        digest = file_sha256(pdf_path)
+        if not force and entry and entry["sha256"] == digest:
+            # Touched but identical content, only refresh the fingerprint
+            entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            stats["unchanged"] += 1
+            continue
+
+        pending.append((pdf_path, stat, digest))
+
+    # Drop files that disappeared from disk, keeping ids another file still owns
+    removed = [p for p in indexed if not os.path.exists(p)]
+    removed_entries = [indexed.pop(pdf_path) for pdf_path in removed]
+    owned = {page_id for entry in indexed.values() for page_id in entry.get("ids", [])}
+    for entry in removed_entries:
+        stale_ids = sorted(set(entry.get("ids", [])) - owned)
+        if stale_ids:
+            collection.delete(ids=stale_ids)
+        for page_id in stale_ids:
+            lexical_index.remove(page_id)
+        stats["removed"] += 1
+
+    if pending:
+        logger.info(f"Indexing {len(pending)} changed PDF(s) with {workers} worker(s), batch size {batch_size}")
+
+    # Ids written in this run; a key can move to another file when the directories
+    # are reconfigured, so they never count as stale for the file that had it before
+    claimed = set()
+    batch = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(parse_pdf, pdf_path): (pdf_path, stat, digest) for pdf_path, stat, digest in pending}
+
+        # Embed as soon as each file is parsed so the pool and the embedder overlap
+        for future in as_completed(futures):
+            pdf_path, stat, digest = futures[future]
+            try:
+                pages = future.result()
+            except Exception as ex:
+                logger.error(f"Error parsing {pdf_path}: {ex}")
+                stats["failed"] += 1
+                continue
+
+            name = keys[pdf_path]
+            ids = []
+            chunked_pages = set()
+            for page_num, chunk_index, start, end, text in iter_chunks(pages, chunking["size"], chunking["overlap"], chunking["unit"]):
+                if chunking["size"] > 0:
+                    chunk_id = f"{name}:{page_num}:{start}"
+                    metadata = {"source": pdf_path, "document": name, "page": page_num,
+                                "chunk": chunk_index, "start_char": start, "end_char": end}
+                else:
+                    chunk_id = f"{name}:{page_num}"
+                    metadata = {"source": pdf_path, "document": name, "page": page_num}
+                ids.append(chunk_id)
+                chunked_pages.add(page_num)
+                batch.append((chunk_id, text, metadata))
+                lexical_index.add(chunk_id, text, metadata)
+
+                if len(batch) >= batch_size:
+                    _flush(collection, embedding_function, batch)
+                    batch = []
+
+            # Chunks that no longer exist in the new version of the file
+            claimed.update(ids)
+            old_ids = indexed.get(pdf_path, {}).get("ids", [])
+            stale_ids = sorted(set(old_ids) - claimed)
+            if stale_ids:
+                collection.delete(ids=stale_ids)
+            for page_id in stale_ids:
+                lexical_index.remove(page_id)
+
+            indexed[pdf_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest,
+                                 "document": name, "ids": ids}
+            stats["indexed"] += 1
+            stats["pages"] += len(chunked_pages)
+            stats["chunks"] += len(ids)
+
+    _flush(collection, embedding_function, batch)
+    os.makedirs(chroma_path, exist_ok=True)
+    lexical_index.save(lexical_index_path)
+    save_manifest(manifest, chroma_path)
+
+    logger.info(f"Ingestion finished: {stats}")
+    return stats
+
+
+# Main Function
+def main():
+    parser = argparse.ArgumentParser(description="Index PDF documents into the document-search Chroma collection")
+    parser.add_argument("dirs", nargs="*", default=DOCUMENT_DIRS, help="Directories to scan for PDF files")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="Number of parser processes")
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE, help="Pages per embedding/upsert batch")
+    parser.add_argument("--force", action="store_true", help="Re-index every file even if unchanged")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Chunk size, 0 indexes whole pages")
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP, help="Overlap between consecutive chunks")
+    parser.add_argument("--chunk-unit", choices=["chars", "tokens"], default=CHUNK_UNIT, help="Unit of chunk size and overlap")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    client, embedding_function, collection = open_collection()
+    stats = ingest_documents(collection, embedding_function, args.dirs, args.workers, args.batch_size, args.force,
+                             chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap, chunk_unit=args.chunk_unit)
+    print(json.dumps(stats))
+    return 0 if not stats["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+import time
+import json
+import asyncio
+
+# Headless replay of scripted MCP traffic through a client session
+#
+# The script is JSONL, one request per line:
+#   {"type": "tool", "name": "query_document", "arguments": {"query_text": "roofline"}}
+#   {"type": "resource", "uri": "document://pdf/ProfilingGuide?pages=1-3"}
+#   {"type": "prompt", "name": "deep_analysis", "arguments": {"query": "main themes"}}
+# An optional "label" groups lines in the report, the default is type:name or the URI path.
+#
+# closed-loop: `concurrency` workers each send their next request when the previous
+#              one finished, optionally paced to `rate` requests per second in total.
+# open-loop:   requests start at a fixed `rate` whether or not earlier ones finished,
+#              latency counts from the scheduled start so queueing is not hidden.
+
+
+def load_script(path: str) -> list[dict]:
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            entry = json.loads(line)
+            if entry.get("type") not in ("tool", "resource", "prompt"):
+                raise ValueError(f"{path}:{line_number}: unknown request type {entry.get('type')!r}")
+            entry.setdefault("label", entry_label(entry))
+            entries.append(entry)
+    if not entries:
+        raise ValueError(f"{path}: no requests")
+    return entries
+
+
+def entry_label(entry: dict) -> str:
+    if entry["type"] == "resource":
+        return f"resource:{entry['uri'].split('?')[0]}"
+    return f"{entry['type']}:{entry['name']}"
+
+
+# Nearest-rank percentile of a sorted list
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+# Whether a tool or resource response reports a failure. The handlers of this server
+# answer most failures with "Error..." text rather than isError. Accepts session
+# results and the lists the server handlers return when called in process.
+def response_failed(result) -> bool:
+    if getattr(result, "isError", False):
+        return True
+    if hasattr(result, "content"):
+        items = result.content
+    elif hasattr(result, "contents"):
+        items = result.contents
+    elif isinstance(result, list):
+        items = result
+    else:
+        return False
+
+    for item in items[:1]:
+        text = getattr(item, "text", None)
+        if text is None:
+            text = getattr(item, "content", None)
+        if isinstance(text, str) and text.startswith("Error"):
+            return True
+    return False
+
+
+# Send one scripted request, returns the request and response sizes in bytes of JSON
+async def send_request(session, entry: dict) -> tuple[int, int, bool]:
+    if entry["type"] == "tool":
+        request = {"name": entry["name"], "arguments": entry.get("arguments") or {}}
+        result = await session.call_tool(request["name"], request["arguments"])
+    elif entry["type"] == "resource":
+        request = {"uri": entry["uri"]}
+        result = await session.read_resource(entry["uri"])
+    else:
+        request = {"name": entry["name"], "arguments": entry.get("arguments") or {}}
+        result = await session.get_prompt(request["name"], request["arguments"])
+    failed = response_failed(result)
+
+    return len(json.dumps(request).encode("utf-8")), len(result.model_dump_json(by_alias=True, exclude_none=True).encode("utf-8")), failed
+
+
+# Shared schedule of request start times at a fixed rate. An open-loop schedule is
+# strict, late starts are not skipped; a closed-loop one never bursts to catch up.
+class Pacer:
+    def __init__(self, rate: float, strict: bool = False):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.strict = strict
+        self.next_start = time.perf_counter()
+
+    # Reserve the next slot and sleep until it, returns the scheduled start time
+    async def wait(self) -> float:
+        scheduled = self.next_start if self.strict else max(self.next_start, time.perf_counter())
+        self.next_start = scheduled + self.interval
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return scheduled
+
+
+class ReplayStats:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.error_samples = []
+
+    def record(self, label: str, seconds: float, failed: bool, sent: int = 0, received: int = 0):
+        self.latencies.setdefault(label, []).append(seconds)
+        self.errors[label] = self.errors.get(label, 0) + (1 if failed else 0)
+        self.bytes_sent += sent
+        self.bytes_received += received
+
+    def report(self, elapsed: float) -> dict:
+        def summarize(latencies: list[float], errors: int) -> dict:
+            latencies = sorted(latencies)
+            return {
+                "requests": len(latencies),
+                "errors": errors,
+                "error_rate": round(errors / len(latencies), 4) if latencies else 0.0,
+                "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+                "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+                "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+            }
+
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        overall = summarize(all_latencies, sum(self.errors.values()))
+        overall.update({
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_rps": round(len(all_latencies) / elapsed, 1) if elapsed else 0.0,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+        })
+        return {
+            "overall": overall,
+            "requests": {label: summarize(values, self.errors[label]) for label, values in sorted(self.latencies.items())},
+            "error_samples": self.error_samples,
+        }
+
+
+# Replay the script `iterations` times, or over and over for `duration` seconds
+async def replay(session, entries: list[dict], concurrency: int = 1, rate: float = 0.0, mode: str = "closed",
+                 iterations: int = 1, duration: float = 0.0, timeout: float = 60.0) -> dict:
+    if mode not in ("closed", "open"):
+        raise ValueError(f"Unknown replay mode: {mode}")
+    if mode == "open" and not rate:
+        raise ValueError("Open-loop replay needs a rate")
+
+    stats = ReplayStats()
+    pacer = Pacer(rate, strict=mode == "open")
+    started = time.perf_counter()
+    deadline = started + duration if duration > 0 else None
+
+    def requests():
+        iteration = 0
+        while deadline is not None or iteration < iterations:
+            for entry in entries:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                yield entry
+            iteration += 1
+
+    async def run_one(entry: dict, scheduled: float):
+        sent = received = 0
+        try:
+            sent, received, failed = await asyncio.wait_for(send_request(session, entry), timeout)
+        except Exception as ex:
+            failed = True
+            if len(stats.error_samples) < 10:
+                stats.error_samples.append(f"{entry['label']}: {type(ex).__name__}: {ex}")
+        stats.record(entry["label"], time.perf_counter() - scheduled, failed, sent, received)
+
+    pending = requests()
+    if mode == "closed":
+        async def worker():
+            for entry in pending:
+                scheduled = await pacer.wait() if rate else time.perf_counter()
+                await run_one(entry, scheduled)
+
+        await asyncio.gather(*(worker() for _ in range(max(concurrency, 1))))
+    else:
+        # Concurrency caps requests in flight; arrivals beyond the cap wait and the
+        # wait shows up in their latency
+        semaphore = asyncio.Semaphore(concurrency) if concurrency > 0 else None
+        tasks = []
+
+        async def limited(entry: dict, scheduled: float):
+            if semaphore is None:
+                return await run_one(entry, scheduled)
+            async with semaphore:
+                await run_one(entry, scheduled)
+
+        for entry in pending:
+            scheduled = await pacer.wait()
+            tasks.append(asyncio.create_task(limited(entry, scheduled)))
+        await asyncio.gather(*tasks)
+
+    return stats.report(time.perf_counter() - started)
+
+
+def format_report(report: dict) -> str:
+    lines = [f"{'request':40s} {'count':>7s} {'errors':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'max ms':>9s}"]
+    for label, summary in list(report["requests"].items()) + [("TOTAL", report["overall"])]:
+        lines.append(
+            f"{label[:40]:40s} {summary['requests']:7d} {summary['errors']:7d} {summary['p50_ms']:9.3f} "
+            f"{summary['p95_ms']:9.3f} {summary['p99_ms']:9.3f} {summary['max_ms']:9.3f}"
+        )
+
+    overall = report["overall"]
+    lines.append(
+        f"\n{overall['requests']} requests in {overall['elapsed_seconds']}s, {overall['throughput_rps']} req/s, "
+        f"error rate {overall['error_rate']:.2%}, sent {overall['bytes_sent']} bytes, received {overall['bytes_received']} bytes"
+    )
+    for sample in report["error_samples"]:
+        lines.append(f"error: {sample}")
+    return "\n".join(lines)
@@ -0,0 +1,36 @@
+import numpy as np
+
+
+# Pick k of the candidates by maximal marginal relevance:
+#   lambda * sim(query, d) - (1 - lambda) * max sim(d, selected)
+# Similarities come from one matrix product over the normalized embeddings; each of
+# the k greedy steps is a vectorized update over all candidates. relevance overrides
+# the query similarity, e.g. with normalized BM25 scores. Returns indexes.
+def mmr_select(query_embedding, embeddings, k: int, mmr_lambda: float = 0.5, relevance=None) -> list[int]:
+    candidates = np.asarray(embeddings, dtype=np.float32)
+    if not len(candidates) or k <= 0:
+        return []
+
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    if relevance is None:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        relevance = candidates @ (query / max(float(np.linalg.norm(query)), 1e-12))
+    else:
+        relevance = np.asarray(relevance, dtype=np.float32)
+    similarity = candidates @ candidates.T
+
+    k = min(k, len(candidates))
+    selected = [int(np.argmax(relevance))]
+    redundancy = similarity[selected[0]].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[selected[0]] = False
+
+    for _ in range(k - 1):
+        scores = mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+        scores[~available] = -np.inf
+        chosen = int(np.argmax(scores))
+        selected.append(chosen)
+        available[chosen] = False
+        np.maximum(redundancy, similarity[chosen], out=redundancy)
+
+    return selected
@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+# Add the cached etag to a resource URI so the server can answer "not modified"
+def conditional_uri(uri: str, etag: str) -> str:
+    parts = urlsplit(uri)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key != "if_none_match"]
+    query.append(("if_none_match", etag))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+# Resource texts by URI with the server etag they were read at, bounded by total
+# size in bytes (UTF-8) with least recently used entries evicted first
+class ResourceCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, uri: str) -> tuple[str, str] | None:
+        with self._lock:
+            entry = self.entries.get(uri)
+            if entry is None:
+                return None
+            self.entries.move_to_end(uri)
+            return entry[0], entry[1]
+
+    def set(self, uri: str, etag: str, text: str):
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            self._discard(uri)
+            if size > self.max_bytes:
+                return
+
+            self.entries[uri] = (etag, text, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def discard(self, uri: str):
+        with self._lock:
+            self._discard(uri)
+
+    def _discard(self, uri: str):
+        entry = self.entries.pop(uri, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    # Validated reads answered from the cache count as hits
+    def record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def stats(self) -> str:
+        return f"{len(self.entries)} entries, {self.size} bytes, {self.hits} hits, {self.misses} misses"
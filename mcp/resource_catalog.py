@@ -0,0 +1,99 @@
+import os
+import logging
+import threading
+
+from mcp.types import Resource
+
+from pdf_ingest import document_key, document_dir_labels
+
+logger = logging.getLogger("document-search-catalog")
+
+
+# In-memory catalog of the PDF documents under the configured directories.
+# refresh() re-lists only directories whose mtime changed, so polling a large
+# tree costs one stat per directory when nothing was added or removed.
+class DocumentCatalog:
+    def __init__(self, dirs: list[str]):
+        self.dirs = [os.path.abspath(d) for d in dirs]
+        self.labels = document_dir_labels(self.dirs)
+        self.paths = {}
+        self.resources = []
+        self.scanned = False
+        # Bumped on every change after the first scan, whichever caller's refresh found it
+        self.generation = 0
+        self._dir_cache = {}
+        self._lock = threading.Lock()
+
+    def _scan_dir(self, directory: str, pdf_files: list[str], seen_dirs: set[str]):
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            return
+
+        seen_dirs.add(directory)
+        cached = self._dir_cache.get(directory)
+        if cached and cached[0] == mtime_ns:
+            files, subdirs = cached[1], cached[2]
+        else:
+            files, subdirs = [], []
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        subdirs.append(entry.path)
+                    elif entry.name.lower().endswith(".pdf"):
+                        files.append(entry.path)
+            files.sort()
+            subdirs.sort()
+            self._dir_cache[directory] = (mtime_ns, files, subdirs)
+
+        pdf_files.extend(files)
+        for subdir in subdirs:
+            self._scan_dir(subdir, pdf_files, seen_dirs)
+
+    # Rescan the document directories, returns True if the set of documents changed
+    def refresh(self) -> bool:
+        with self._lock:
+            pdf_files = []
+            seen_dirs = set()
+            for directory in self.dirs:
+                self._scan_dir(directory, pdf_files, seen_dirs)
+
+            for directory in [d for d in self._dir_cache if d not in seen_dirs]:
+                del self._dir_cache[directory]
+
+            # Keyed like the index, see pdf_ingest.document_key
+            paths = {}
+            for pdf_path in pdf_files:
+                key = document_key(pdf_path, self.dirs, self.labels)
+                if key in paths:
+                    if paths[key] != pdf_path:
+                        logger.warning(f"Skipping {pdf_path}: document key {key} already used by {paths[key]}")
+                    continue
+                paths[key] = pdf_path
+
+            changed = paths != self.paths
+            if changed and self.scanned:
+                self.generation += 1
+            if changed or not self.scanned:
+                self.paths = paths
+                self.resources = [self._resource(name) for name in sorted(paths)]
+                self.scanned = True
+            return changed
+
+    def _resource(self, name: str) -> Resource:
+        return Resource(
+            uri=f"document://pdf/{name}",
+            name=name.replace('_', ' ').title(),
+            description=f"PDF Document: {name}",
+            mimeType="application/pdf"
+        )
+
+    def list_resources(self) -> list[Resource]:
+        if not self.scanned:
+            self.refresh()
+        return self.resources
+
+    def path(self, name: str) -> str | None:
+        if not self.scanned:
+            self.refresh()
+        return self.paths.get(name)
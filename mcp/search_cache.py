@@ -0,0 +1,79 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+
+# Normalize query text so trivially different phrasings share a cache entry
+def normalize_query(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+# Thread-safe LRU cache with per-entry time-to-live and hit/miss counters
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, value = item
+                if self.ttl <= 0 or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        return f"hits={self.hits} misses={self.misses} hit_rate={hit_rate:.2%} size={len(self)}/{self.maxsize}"
+
+
+# Version of the collection contents, used as part of every result cache key.
+# Changes when this process modifies the collection (bump) or when another
+# process finishes an ingestion run (the manifest file is rewritten).
+class CollectionVersion:
+    def __init__(self, manifest_path: str = None):
+        self.manifest_path = manifest_path
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def bump(self):
+        with self._lock:
+            self._counter += 1
+
+    def current(self) -> tuple:
+        stamp = None
+        if self.manifest_path:
+            try:
+                stat = os.stat(self.manifest_path)
+                stamp = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                pass
+        return (self._counter, stamp)
@@ -0,0 +1,303 @@
+import os
+import json
+import logging
+import threading
+
+from pdf_ingest import open_collection, CHROMA_PATH, MANIFEST_NAME, LEXICAL_INDEX_NAME
+from bm25_index import BM25Index, reciprocal_rank_fusion
+from search_cache import TTLCache, CollectionVersion, normalize_query
+from server_metrics import ServerMetrics
+from metadata_filter import matches_where, matches_where_document
+
+# Search pipeline shared by the MCP server and the HTTP API: one collection,
+# embedder, lexical index and set of caches per process.
+
+logger = logging.getLogger("document-search-core")
+
+# Per-stage latency histograms and counters
+metrics = ServerMetrics()
+
+# ChromaDB client, opened once per process by open_search_collection
+client = None
+embedding_function = None
+collection = None
+collection_lock = threading.Lock()
+
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+
+
+# Query embedding and search result caches
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "600"))
+
+embedding_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+result_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+collection_version = CollectionVersion(os.path.join(CHROMA_PATH, MANIFEST_NAME))
+
+
+# Open the collection and load the lexical index, later calls reuse both
+def open_search_collection():
+    global client, embedding_function, collection
+
+    with collection_lock:
+        if collection is None:
+            client, embedding_function, collection = open_collection()
+    get_lexical_index()
+    return collection
+
+
+# Embed query texts in one batch, reusing the embeddings of previously seen queries
+def embed_queries(query_texts: list[str]) -> list:
+    keys = [normalize_query(text) for text in query_texts]
+    embeddings = {key: embedding_cache.get(key) for key in keys}
+
+    missing = {key: text for key, text in zip(keys, query_texts) if embeddings[key] is None}
+    if missing:
+        with metrics.timer("stage.embed"):
+            new_embeddings = embedding_function(list(missing.values()))
+        for key, embedding in zip(missing, new_embeddings):
+            embedding_cache.set(key, embedding)
+            embeddings[key] = embedding
+
+    return [embeddings[key] for key in keys]
+
+
+def embed_query(query_text: str):
+    return embed_queries([query_text])[0]
+
+
+# Chroma query result fields that hold one list per query
+QUERY_RESULT_FIELDS = ("ids", "documents", "metadatas", "distances", "embeddings", "uris", "data")
+QUERY_INCLUDE = ["documents", "metadatas", "distances"]
+
+
+# Cache key part for a where/where_document pair, None when unfiltered
+def filter_key(where: dict | None, where_document: dict | None) -> str | None:
+    if not where and not where_document:
+        return None
+    return json.dumps([where, where_document], sort_keys=True)
+
+
+# Run vector searches for several queries with a single collection.query call.
+# Metadata filters are pushed down to Chroma, so only matching entries are searched.
+# Results are cached per query on query text, result count, filters and collection version.
+# With include_embeddings the stored embeddings of the hits come back too, for the MMR rerank.
+def search_collection_batch(query_texts: list[str], num_results: int, where: dict = None, where_document: dict = None,
+                            include_embeddings: bool = False) -> list[dict]:
+    version = collection_version.current()
+    filters = filter_key(where, where_document)
+    keys = [(normalize_query(text), num_results, filters, version, include_embeddings) for text in query_texts]
+    results = {key: result_cache.get(key) for key in keys}
+
+    missing = {key: text for key, text in zip(keys, query_texts) if results[key] is None}
+    if missing:
+        query_embeddings = embed_queries(list(missing.values()))
+        with metrics.timer("stage.vector_search"):
+            batch_results = collection.query(
+                query_embeddings=query_embeddings,
+                n_results=num_results,
+                where=where or None,
+                where_document=where_document or None,
+                include=QUERY_INCLUDE + (["embeddings"] if include_embeddings else [])
+            )
+        for i, key in enumerate(missing):
+            single = {field: [batch_results[field][i]] for field in QUERY_RESULT_FIELDS if batch_results.get(field) is not None}
+            result_cache.set(key, single)
+            results[key] = single
+
+    return [results[key] for key in keys]
+
+
+def search_collection(query_text: str, num_results: int, where: dict = None, where_document: dict = None,
+                      include_embeddings: bool = False) -> dict:
+    return search_collection_batch([query_text], num_results, where, where_document, include_embeddings)[0]
+
+
+# Stored embeddings by id of a single-query result fetched with include_embeddings
+def result_embeddings(results: dict) -> dict:
+    if not results or results.get("embeddings") is None:
+        return {}
+    return dict(zip(results["ids"][0], results["embeddings"][0]))
+
+
+# Flatten a single-query result into (id, document, distance, metadata) hits
+def iter_hits(results: dict):
+    if not results or not results.get('documents') or not results['documents'][0]:
+        return []
+
+    documents = results['documents'][0]
+    return list(zip(
+        results['ids'][0] if results.get('ids') else [None] * len(documents),
+        documents,
+        results['distances'][0],
+        results['metadatas'][0] if results.get('metadatas') else [{}] * len(documents)
+    ))
+
+
+# Merge hits of several queries, keeping the best score of each document
+def merge_hits(results_list: list[dict], num_results: int) -> list[tuple]:
+    merged = {}
+    for query_index, results in enumerate(results_list):
+        for doc_id, doc, distance, metadata in iter_hits(results):
+            key = doc_id if doc_id is not None else doc
+            if key not in merged:
+                merged[key] = [doc_id, doc, distance, metadata, [query_index + 1]]
+            else:
+                merged[key][2] = min(merged[key][2], distance)
+                merged[key][4].append(query_index + 1)
+
+    return sorted(merged.values(), key=lambda hit: hit[2])[:num_results]
+
+
+# Lexical BM25 index, reloaded whenever an ingestion run rewrites it
+LEXICAL_INDEX_PATH = os.path.join(CHROMA_PATH, LEXICAL_INDEX_NAME)
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+
+lexical_index = BM25Index()
+lexical_index_version = None
+lexical_index_lock = threading.Lock()
+
+
+def get_lexical_index() -> BM25Index:
+    global lexical_index, lexical_index_version
+
+    version = collection_version.current()
+    if version != lexical_index_version:
+        with lexical_index_lock:
+            if version != lexical_index_version:
+                lexical_index = BM25Index.load(LEXICAL_INDEX_PATH)
+                lexical_index_version = version
+    return lexical_index
+
+
+# Doc ids of the lexical index matching a filter, cached per filter and collection version
+lexical_filter_cache = TTLCache(256, QUERY_CACHE_TTL)
+
+
+def lexical_allowed_ids(index: BM25Index, where: dict = None, where_document: dict = None) -> set[str] | None:
+    filters = filter_key(where, where_document)
+    if filters is None:
+        return None
+
+    key = (filters, collection_version.current())
+    allowed = lexical_filter_cache.get(key)
+    if allowed is None:
+        with metrics.timer("stage.lexical_filter"):
+            allowed = {
+                doc_id for doc_id, (text, metadata) in index.documents.items()
+                if matches_where(metadata, where) and matches_where_document(text, where_document)
+            }
+        lexical_filter_cache.set(key, allowed)
+    return allowed
+
+
+# Keyword search on the BM25 index, no embedding call involved
+def lexical_hits(query_text: str, num_results: int, where: dict = None, where_document: dict = None) -> list[tuple]:
+    index = get_lexical_index()
+    allowed = lexical_allowed_ids(index, where, where_document)
+    with metrics.timer("stage.lexical_search"):
+        ranked = index.search(query_text, num_results, allowed)
+
+    hits = []
+    for doc_id, score in ranked:
+        doc, metadata = index.documents[doc_id]
+        hits.append((doc_id, doc, score, metadata))
+    return hits
+
+
+# Vector and BM25 rankings fused with reciprocal rank fusion. `embeddings`, when given,
+# is filled with the stored embeddings of the vector candidates.
+def hybrid_hits(query_text: str, num_results: int, where: dict = None, where_document: dict = None,
+                embeddings: dict = None) -> list[tuple]:
+    candidates = max(num_results, HYBRID_CANDIDATES)
+    results = search_collection(query_text, candidates, where, where_document, embeddings is not None)
+    if embeddings is not None:
+        embeddings.update(result_embeddings(results))
+    vector = iter_hits(results)
+    lexical = lexical_hits(query_text, candidates, where, where_document)
+
+    documents = {doc_id: (doc, metadata) for doc_id, doc, _, metadata in lexical + vector}
+    with metrics.timer("stage.fusion"):
+        fused = reciprocal_rank_fusion([[hit[0] for hit in vector], [hit[0] for hit in lexical]])
+    hits = []
+    for doc_id, score in fused[:num_results]:
+        doc, metadata = documents[doc_id]
+        hits.append((doc_id, doc, score, metadata))
+    return hits
+
+
+# Maximal marginal relevance rerank of search hits; MMR_LAMBDA enables it by default,
+# 1 ranks by relevance only, lower values trade relevance for diversity
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA")) if os.getenv("MMR_LAMBDA") else None
+MMR_FETCH_FACTOR = int(os.getenv("MMR_FETCH_FACTOR", "4"))
+MMR_MIN_CANDIDATES = int(os.getenv("MMR_MIN_CANDIDATES", "20"))
+
+
+def mmr_candidates(num_results: int) -> int:
+    return max(num_results * MMR_FETCH_FACTOR, MMR_MIN_CANDIDATES)
+
+
+# Rerank hits of any search mode with MMR over their stored embeddings. Vector hits
+# use the query similarity as relevance; BM25 and RRF scores are scaled to 0-1 instead.
+# `embeddings` holds those returned by the over-fetch query, only the others (BM25-only
+# candidates) are loaded from the collection.
+def mmr_rerank(query_text: str, hits: list[tuple], num_results: int, mmr_lambda: float, use_scores: bool = False,
+               embeddings: dict = None) -> list[tuple]:
+    from rerank import mmr_select
+
+    if len(hits) <= 1:
+        return hits[:num_results]
+
+    embeddings = dict(embeddings or {})
+    missing = [hit[0] for hit in hits if hit[0] not in embeddings]
+    if missing:
+        stored = collection.get(ids=missing, include=["embeddings"])
+        embeddings.update(zip(stored["ids"], stored["embeddings"]))
+
+    # Hits without a stored embedding cannot be compared and are dropped; with none
+    # left (lexical index and collection out of sync) the ranking is kept as is
+    reranked = [hit for hit in hits if hit[0] in embeddings]
+    if not reranked:
+        logger.warning(f"No stored embeddings for {len(hits)} candidate(s), skipping the MMR rerank")
+        return hits[:num_results]
+    hits = reranked
+
+    query_embedding = None if use_scores else embed_query(query_text)
+    relevance = None
+    if use_scores:
+        top_score = max(hit[2] for hit in hits) or 1.0
+        relevance = [hit[2] / top_score for hit in hits]
+    with metrics.timer("stage.rerank"):
+        selected = mmr_select(query_embedding, [embeddings[hit[0]] for hit in hits], num_results, mmr_lambda, relevance)
+    return [hits[i] for i in selected]
+
+
+# Ranked (id, document, score, metadata) hits of one query in any search mode, with
+# the label of the score (None for vector distances). Blocking, run it in an executor.
+def run_search(query_text: str, num_results: int, mode: str = "vector", where: dict = None,
+               where_document: dict = None, mmr_lambda: float = None) -> tuple[list[tuple], str | None]:
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {mode}")
+
+    # Over-fetch candidates for the diversity rerank
+    fetch_results = num_results if mmr_lambda is None else mmr_candidates(num_results)
+
+    # Stored embeddings of the candidates, requested with the query when reranking
+    embeddings = {} if mmr_lambda is not None else None
+
+    if mode == "lexical":
+        hits = lexical_hits(query_text, fetch_results, where, where_document)
+        score_label = "BM25"
+    elif mode == "hybrid":
+        hits = hybrid_hits(query_text, fetch_results, where, where_document, embeddings)
+        score_label = "RRF"
+    else:
+        results = search_collection(query_text, fetch_results, where, where_document, embeddings is not None)
+        if embeddings is not None:
+            embeddings.update(result_embeddings(results))
+        hits = iter_hits(results)
+        score_label = None
+
+    if hits and mmr_lambda is not None:
+        hits = mmr_rerank(query_text, hits, num_results, mmr_lambda, score_label is not None, embeddings)
+    return hits, score_label
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+
+import anyio
+from mcp import ClientSession, StdioServerParameters, McpError
+from mcp.client.stdio import stdio_client
+from mcp.types import CONNECTION_CLOSED
+
+logger = logging.getLogger("document-search-client")
+
+# Errors that mean the replica process or its pipes are gone
+TRANSPORT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream, ConnectionError)
+
+
+def is_transport_error(ex: BaseException) -> bool:
+    if isinstance(ex, McpError):
+        return ex.error.code == CONNECTION_CLOSED
+    return isinstance(ex, TRANSPORT_ERRORS)
+
+
+# One server process with its session. The transport is opened and closed inside
+# the replica's own task, as the stdio client's task group requires.
+class ServerReplica:
+    def __init__(self, index: int, server_params: StdioServerParameters, message_handler=None):
+        self.index = index
+        self.server_params = server_params
+        self.message_handler = message_handler
+        self.session = None
+        self.init_result = None
+        self.error = None
+        self.outstanding = 0
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task = None
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run(), name=f"server-replica-{self.index}")
+        await self._ready.wait()
+        if self.session is None:
+            raise ConnectionError(f"Server replica {self.index} failed to start: {self.error}")
+        return self.init_result
+
+    async def _run(self):
+        try:
+            async with stdio_client(self.server_params) as (read, write):
+                async with ClientSession(read, write, message_handler=self.message_handler) as session:
+                    self.init_result = await session.initialize()
+                    self.session = session
+                    self._ready.set()
+                    await self._stop.wait()
+        except Exception as ex:
+            self.error = ex
+            logger.error(f"Server replica {self.index} stopped: {ex}")
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def close(self):
+        self.session = None
+        self._stop.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, 5)
+            except (asyncio.TimeoutError, Exception):
+                self._task.cancel()
+
+
+# N replicas of a stdio server behind a ClientSession-like interface. Requests go to
+# the live replica with the fewest outstanding requests; a replica whose process died
+# is restarted and the request is retried once on another replica. The server's
+# tools and resource reads are read-only, so a retry cannot apply anything twice.
+class ServerPool:
+    def __init__(self, server_params: StdioServerParameters, size: int, message_handler=None,
+                 health_interval: float = 10.0):
+        self.server_params = server_params
+        self.message_handler = message_handler
+        self.health_interval = health_interval
+        self.replicas = [ServerReplica(i, server_params, message_handler) for i in range(size)]
+        self.restarts = 0
+        self._restarting = {}
+        self._health_task = None
+
+    async def start(self):
+        results = await asyncio.gather(*(replica.start() for replica in self.replicas), return_exceptions=True)
+        started = [result for result in results if not isinstance(result, BaseException)]
+        if not started:
+            raise ConnectionError(f"No server replica started: {results[0]}")
+
+        for replica, result in zip(self.replicas, results):
+            if isinstance(result, BaseException):
+                self.schedule_restart(replica)
+
+        if self.health_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+        return started[0]
+
+    def pick(self) -> ServerReplica:
+        alive = [replica for replica in self.replicas if replica.alive]
+        if not alive:
+            raise ConnectionError("No live server replica")
+        return min(alive, key=lambda replica: replica.outstanding)
+
+    # Replace a dead replica, at most one restart per slot at a time. The replica
+    # stops taking requests right away.
+    def schedule_restart(self, replica: ServerReplica):
+        replica.session = None
+        if replica.index in self._restarting:
+            return
+        self._restarting[replica.index] = asyncio.create_task(self._restart(replica))
+
+    async def _restart(self, replica: ServerReplica):
+        try:
+            await replica.close()
+            delay = 0.5
+            while True:
+                new_replica = ServerReplica(replica.index, self.server_params, self.message_handler)
+                try:
+                    await new_replica.start()
+                    break
+                except Exception as ex:
+                    logger.error(f"Restarting server replica {replica.index} failed: {ex}")
+                    await new_replica.close()
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 30)
+
+            self.replicas[replica.index] = new_replica
+            self.restarts += 1
+            logger.info(f"Server replica {replica.index} restarted")
+        finally:
+            self._restarting.pop(replica.index, None)
+
+    # Ping idle replicas so that crashed ones are restarted before the next request
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for replica in list(self.replicas):
+                if replica.index in self._restarting:
+                    continue
+                if not replica.alive:
+                    self.schedule_restart(replica)
+                    continue
+                try:
+                    await asyncio.wait_for(replica.session.send_ping(), self.health_interval)
+                except Exception as ex:
+                    logger.error(f"Server replica {replica.index} failed health check: {ex}")
+                    self.schedule_restart(replica)
+
+    async def request(self, method: str, *args, **kwargs):
+        for attempt in range(2):
+            replica = self.pick()
+            replica.outstanding += 1
+            try:
+                return await getattr(replica.session, method)(*args, **kwargs)
+            except Exception as ex:
+                if not is_transport_error(ex) or attempt:
+                    raise
+                logger.error(f"Server replica {replica.index} lost during {method}: {ex}")
+                self.schedule_restart(replica)
+            finally:
+                replica.outstanding -= 1
+
+    async def call_tool(self, name: str, arguments: dict | None = None, **kwargs):
+        return await self.request("call_tool", name, arguments, **kwargs)
+
+    async def read_resource(self, uri):
+        return await self.request("read_resource", uri)
+
+    async def list_tools(self, *args, **kwargs):
+        return await self.request("list_tools", *args, **kwargs)
+
+    async def list_resources(self, *args, **kwargs):
+        return await self.request("list_resources", *args, **kwargs)
+
+    async def list_prompts(self, *args, **kwargs):
+        return await self.request("list_prompts", *args, **kwargs)
+
+    async def get_prompt(self, name: str, arguments: dict | None = None):
+        return await self.request("get_prompt", name, arguments)
+
+    async def send_ping(self):
+        return await self.request("send_ping")
+
+    def stats(self) -> list[dict]:
+        return [
+            {"replica": replica.index, "alive": replica.alive, "outstanding": replica.outstanding}
+            for replica in self.replicas
+        ]
+
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for task in list(self._restarting.values()):
+            task.cancel()
+        await asyncio.gather(*(replica.close() for replica in self.replicas), return_exceptions=True)
@@ -0,0 +1,72 @@
+from collections import Counter
+
+from bm25_index import TOKEN_PATTERN, tokenize
+
+ELLIPSIS = "..."
+
+
+# Query terms to look for, dotted/dashed identifiers also match by their parts
+def query_terms(query_text: str) -> set[str]:
+    terms = set()
+    for token in tokenize(query_text):
+        terms.add(token)
+        terms.update(part for part in token.replace("-", ".").split(".") if len(part) > 1)
+    return {term for term in terms if len(term) > 1}
+
+
+# Best window of at most max_chars characters: the one covering the most distinct
+# query terms, then the most term occurrences. Falls back to the start of the text.
+def best_window(text: str, terms: set[str], max_chars: int) -> tuple[int, int]:
+    matches = []
+    for match in TOKEN_PATTERN.finditer(text):
+        token = match.group().lower()
+        if token in terms:
+            matches.append((match.start(), match.end(), token))
+        else:
+            for part in token.replace("-", ".").split("."):
+                if part in terms:
+                    matches.append((match.start(), match.end(), part))
+                    break
+
+    if not matches:
+        return 0, min(max_chars, len(text))
+
+    best = (0, 0, 0, 0)
+    seen = Counter()
+    left = 0
+    for right, (_, end, term) in enumerate(matches):
+        seen[term] += 1
+        while left < right and end - matches[left][0] > max_chars:
+            seen[matches[left][2]] -= 1
+            if not seen[matches[left][2]]:
+                del seen[matches[left][2]]
+            left += 1
+        score = (len(seen), right - left + 1)
+        if score > best[:2]:
+            best = (*score, matches[left][0], end)
+
+    # Center the matched span in the window
+    span_start, span_end = best[2], best[3]
+    start = max(span_start - (max_chars - (span_end - span_start)) // 2, 0)
+    end = min(start + max_chars, len(text))
+    return max(end - max_chars, 0), end
+
+
+# Query-focused excerpt of a document cut at word boundaries, at most max_chars long
+# including the ellipses; text within the limit is returned as is
+def extract_snippet(text: str, query_text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+
+    start, end = best_window(text, query_terms(query_text), max(max_chars - 2 * len(ELLIPSIS), 1))
+    if start > 0:
+        boundary = text.find(" ", start, end)
+        if boundary != -1:
+            start = boundary + 1
+    if end < len(text):
+        boundary = text.rfind(" ", start, end)
+        if boundary > start:
+            end = boundary
+
+    snippet = text[start:end].strip()
+    return f"{ELLIPSIS if start > 0 else ''}{snippet}{ELLIPSIS if end < len(text) else ''}"
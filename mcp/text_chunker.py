@@ -0,0 +1,55 @@
+import re
+
+WORD_PATTERN = re.compile(r"\S+")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+# Split one page into overlapping windows, yields (start, end) character offsets.
+# unit="chars" measures size and overlap in characters and prefers to cut at
+# whitespace; unit="tokens" measures them in whitespace separated words.
+def chunk_spans(text: str, size: int, overlap: int = 0, unit: str = "chars"):
+    if unit == "tokens":
+        words = [(m.start(), m.end()) for m in WORD_PATTERN.finditer(text)]
+        step = max(size - overlap, 1)
+        for i in range(0, len(words), step):
+            window = words[i:i + size]
+            yield window[0][0], window[-1][1]
+            if i + size >= len(words):
+                break
+        return
+
+    length = len(text)
+    start = 0
+    while start < length:
+        end = min(start + size, length)
+        if end < length:
+            cut = max(text.rfind(" ", start + size // 2, end), text.rfind("\n", start + size // 2, end))
+            if cut > start:
+                end = cut
+        yield start, end
+
+        if end >= length:
+            break
+        next_start = max(end - overlap, start + 1)
+
+        # Start the next window on a word boundary
+        boundary = WHITESPACE_PATTERN.search(text, next_start, end)
+        start = boundary.end() if boundary and overlap else next_start
+
+
+# Stream (page, chunk index, start, end, text) chunks from (page, text) pages.
+# size <= 0 keeps whole pages as single chunks.
+def iter_chunks(pages, size: int, overlap: int = 0, unit: str = "chars"):
+    for page_num, text in pages:
+        if size <= 0:
+            if text.strip():
+                yield page_num, 0, 0, len(text), text
+            continue
+
+        chunk_index = 0
+        for start, end in chunk_spans(text, size, overlap, unit):
+            chunk = text[start:end]
+            if not chunk.strip():
+                continue
+            yield page_num, chunk_index, start, end, chunk
+            chunk_index += 1
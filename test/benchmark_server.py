@@ -0,0 +1,314 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import resource
+import argparse
+import tempfile
+import subprocess
+
+# Benchmark for the document-search MCP server
+#
+# Calls the tool, resource and prompt handlers of mcp/mcp_server_stdio.py directly
+# and through a real stdio session, against the PDFs in data/ plus synthetic
+# large PDFs, using the deterministic local hashing embedder.
+#
+#   python benchmark_server.py --save baseline.json
+#   python benchmark_server.py --compare baseline.json
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(ROOT_DIR, "mcp")
+SERVER_SCRIPT = os.path.join(SERVER_DIR, "mcp_server_stdio.py")
+INGEST_SCRIPT = os.path.join(SERVER_DIR, "pdf_ingest.py")
+
+sys.path.insert(0, SERVER_DIR)
+from replay_load import response_failed
+
+QUERIES = [
+    "how to collect metrics for a single kernel",
+    "--query-metrics-mode suffix",
+    "sm__cycles_elapsed.avg",
+    "memory workload analysis",
+    "roofline chart",
+    "launch__grid_size",
+    "replay mode application kernel",
+    "achieved occupancy warp scheduler",
+    "nvprof transition guide",
+    "source counters branch efficiency",
+]
+
+WORDS = [
+    "kernel", "warp", "occupancy", "throughput", "memory", "latency", "register", "shared",
+    "cache", "L2", "L1", "branch", "scheduler", "instruction", "pipeline", "stall", "section",
+    "metric", "profile", "replay", "sm__cycles_elapsed.avg", "dram__bytes_read.sum",
+    "launch__grid_size", "--metrics", "--section", "--target-processes", "roofline", "tensor",
+    "the", "of", "and", "to", "for", "is", "in", "with", "per", "each",
+]
+
+
+# Minimal text-only PDF writer so synthetic documents need no extra dependency
+def write_synthetic_pdf(path: str, pages: int, lines_per_page: int = 45, seed: int = 0):
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+
+    page_ids = []
+    for page in range(pages):
+        lines = [f"Synthetic page {page + 1}"]
+        lines += [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(lines_per_page)]
+        ops = ["BT", "/F1 10 Tf", "12 TL", "40 790 Td"] + [f"({line}) '" for line in lines] + ["ET"]
+        stream = "\n".join(ops).encode("latin-1")
+
+        page_ids.append(len(objects) + 1)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects) + 2} 0 R >>".encode("latin-1")
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode("latin-1")
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+        xref_offset = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset))
+
+
+# Nearest-rank percentile of a sorted list
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF) -> float:
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+# Run `requests` calls of one scenario with at most `concurrency` in flight
+async def run_scenario(call, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                if response_failed(await call(i)):
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "throughput_rps": round(requests / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+# The same workload expressed against handlers or a client session
+def build_scenarios(call_tool, read_resource, list_resources, get_prompt, documents: list[str]) -> dict:
+    def query(mode):
+        return lambda i: call_tool("query_document", {"query_text": QUERIES[i % len(QUERIES)], "num_results": 5, "mode": mode})
+
+    return {
+        "query_document_vector": query("vector"),
+        "query_document_lexical": query("lexical"),
+        "query_document_hybrid": query("hybrid"),
+        "query_documents_batch": lambda i: call_tool("query_documents", {"queries": QUERIES[:5], "num_results": 5}),
+        "get_collection_info": lambda i: call_tool("get_collection_info", {}),
+        "list_resources": lambda i: list_resources(),
+        "read_resource_pages": lambda i: read_resource(f"document://pdf/{documents[i % len(documents)]}?pages=1-3"),
+        "read_resource_full": lambda i: read_resource(f"document://pdf/{documents[i % len(documents)]}"),
+        "get_prompt": lambda i: get_prompt("deep_analysis", {"query": "main themes"}),
+    }
+
+
+async def run_scenarios(scenarios: dict, requests: int, concurrency_levels: list[int], only: list[str] = None) -> dict:
+    results = {}
+    for name, call in scenarios.items():
+        if only and name not in only:
+            continue
+        # One untimed call warms caches the way a long-running server would have them
+        await run_scenario(call, 1, 1)
+        for concurrency in concurrency_levels:
+            result = await run_scenario(call, requests, concurrency)
+            results[f"{name}@{concurrency}"] = result
+            print(f"{name:28s} c={concurrency:<3d} p50={result['p50_ms']:9.3f}ms p95={result['p95_ms']:9.3f}ms "
+                  f"p99={result['p99_ms']:9.3f}ms {result['throughput_rps']:9.1f} req/s errors={result['errors']}",
+                  file=sys.stderr)
+    return results
+
+
+async def bench_in_process(args, documents: list[str]) -> dict:
+    import mcp_server_stdio as server_module
+
+    await server_module.warm_up()
+    scenarios = build_scenarios(
+        server_module.handle_call_tool,
+        server_module.handle_read_resource,
+        server_module.handle_list_resource,
+        server_module.handle_get_prompt,
+        documents,
+    )
+    results = await run_scenarios(scenarios, args.requests, args.concurrency, args.only)
+    return {"scenarios": results, "peak_rss_mb": peak_rss_mb()}
+
+
+async def bench_stdio(args, documents: list[str]) -> dict:
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    params = StdioServerParameters(command=sys.executable, args=[SERVER_SCRIPT], env=dict(os.environ))
+    with open(os.devnull, "w") as errlog:
+        async with stdio_client(params, errlog=errlog) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                scenarios = build_scenarios(
+                    session.call_tool,
+                    session.read_resource,
+                    session.list_resources,
+                    session.get_prompt,
+                    documents,
+                )
+                results = await run_scenarios(scenarios, args.requests, args.concurrency, args.only)
+
+                # Measured by the server itself, RUSAGE_CHILDREN would also count the ingestion run
+                server_metrics = await session.call_tool("get_server_metrics", {})
+                server_peak_rss = json.loads(server_metrics.content[0].text).get("peak_rss_mb")
+
+    return {"scenarios": results, "server_peak_rss_mb": server_peak_rss}
+
+
+# Print the relative change of every scenario against a saved baseline
+def compare(report: dict, baseline: dict, threshold: float) -> int:
+    regressions = 0
+    for transport, current in report["transports"].items():
+        previous = baseline.get("transports", {}).get(transport)
+        if not previous:
+            continue
+
+        for name, result in current["scenarios"].items():
+            before = previous["scenarios"].get(name)
+            if not before:
+                continue
+
+            p95_change = (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+            rps_change = (result["throughput_rps"] - before["throughput_rps"]) / before["throughput_rps"] * 100 if before["throughput_rps"] else 0.0
+            flag = ""
+            if p95_change > threshold or rps_change < -threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"{transport:6s} {name:32s} p95 {before['p95_ms']:9.3f} -> {result['p95_ms']:9.3f}ms ({p95_change:+6.1f}%)  "
+                  f"rps {before['throughput_rps']:9.1f} -> {result['throughput_rps']:9.1f} ({rps_change:+6.1f}%){flag}")
+    return regressions
+
+
+def prepare_environment(args, work_dir: str) -> list[str]:
+    synthetic_dir = os.path.join(work_dir, "synthetic")
+    os.makedirs(synthetic_dir, exist_ok=True)
+    for i in range(args.synthetic_docs):
+        write_synthetic_pdf(os.path.join(synthetic_dir, f"synthetic_{i}.pdf"), args.synthetic_pages, seed=i)
+
+    # Must be set before the server modules are imported, they read it at import time
+    os.environ.update({
+        "EMBEDDING_BACKEND": "hashing",
+        "CHROMA_PATH": os.path.join(work_dir, "chroma"),
+        "PAGE_CACHE_DIR": os.path.join(work_dir, "page_cache"),
+        "DOCUMENT_DIRS": os.pathsep.join([os.path.join(ROOT_DIR, "data"), synthetic_dir]),
+        "CATALOG_POLL_INTERVAL": "0",
+    })
+
+    # Ingest in a separate process so that its memory (Chroma upserts, parser workers)
+    # does not count towards the peak RSS of the benchmarked server
+    started = time.perf_counter()
+    ingest = subprocess.run([sys.executable, INGEST_SCRIPT], env=dict(os.environ), capture_output=True, text=True, check=True)
+    stats = json.loads(ingest.stdout.strip().splitlines()[-1])
+    print(f"Ingested {stats['pages']} pages in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+    import pdf_ingest
+
+    return [pdf_ingest.document_key(path, pdf_ingest.DOCUMENT_DIRS) for path in pdf_ingest.discover_pdfs(pdf_ingest.DOCUMENT_DIRS)]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Latency/throughput benchmark for the document-search MCP server")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and concurrency level")
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 4, 16])
+    parser.add_argument("--transport", choices=["inproc", "stdio", "both"], default="both")
+    parser.add_argument("--only", type=lambda v: v.split(","), default=None, help="Comma separated scenario names")
+    parser.add_argument("--synthetic-docs", type=int, default=2)
+    parser.add_argument("--synthetic-pages", type=int, default=500)
+    parser.add_argument("--work-dir", default=None, help="Keep the index and caches here instead of a temp dir")
+    parser.add_argument("--save", help="Write the report as a JSON baseline")
+    parser.add_argument("--compare", help="Compare against a saved JSON baseline")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir = args.work_dir or tmp_dir
+        documents = prepare_environment(args, work_dir)
+
+        report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "args": vars(args), "transports": {}}
+        if args.transport in ("inproc", "both"):
+            report["transports"]["inproc"] = await bench_in_process(args, documents)
+        if args.transport in ("stdio", "both"):
+            report["transports"]["stdio"] = await bench_stdio(args, documents)
+
+    print(json.dumps(report, indent=2))
+
+    failing = [
+        f"{transport}/{name}"
+        for transport, result in report["transports"].items()
+        for name, scenario in result["scenarios"].items() if scenario["errors"]
+    ]
+    if failing:
+        print(f"Scenarios with errors: {', '.join(failing)}", file=sys.stderr)
+        if args.save:
+            print("Not saving a baseline with failing scenarios", file=sys.stderr)
+            sys.exit(1)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mcp"))
+
+from bm25_index import BM25Index, tokenize
+
+DOCUMENTS = {
+    "guide:0": "Warp stall sampling reports why a warp could not issue.",
+    "guide:1": "Achieved occupancy is the ratio of active warp slots to the maximum.",
+    "cli:0": "Use --metrics sm__cycles_elapsed.avg to collect the cycle count.",
+    "cli:1": "The L2 cache throughput is shown per kernel launch.",
+}
+
+
+# Postings, lengths and total_length must match an index rebuilt from the live documents
+def assert_consistent(index: BM25Index):
+    expected_postings = {}
+    for doc_id, (text, _) in index.documents.items():
+        counts = Counter(tokenize(text))
+        assert index.doc_lengths[doc_id] == sum(counts.values())
+        for term, tf in counts.items():
+            expected_postings.setdefault(term, {})[doc_id] = tf
+    assert index.postings == expected_postings
+    assert set(index.doc_lengths) == set(index.documents)
+    assert index.total_length == sum(index.doc_lengths.values())
+
+
+def build() -> BM25Index:
+    index = BM25Index()
+    for doc_id, text in DOCUMENTS.items():
+        index.add(doc_id, text, {"document": doc_id.split(":")[0]})
+    return index
+
+
+def test_add_readd_and_remove_keep_the_index_consistent():
+    index = build()
+    assert len(index) == 4
+    assert_consistent(index)
+
+    index.add("guide:0", "Replaced text about shared memory bank conflicts.")
+    assert len(index) == 4
+    assert_consistent(index)
+    assert "stall" not in index.postings
+    assert index.search("bank conflicts", 1)[0][0] == "guide:0"
+
+    index.remove("cli:0")
+    index.remove("cli:0")
+    index.remove("missing")
+    assert len(index) == 3
+    assert_consistent(index)
+    assert "sm__cycles_elapsed.avg" not in index.postings
+
+    for doc_id in list(index.documents):
+        index.remove(doc_id)
+    assert index.postings == {} and index.total_length == 0
+    assert index.search("warp") == []
+
+
+def test_identifiers_stay_single_tokens():
+    index = build()
+    assert index.search("sm__cycles_elapsed.avg", 1)[0][0] == "cli:0"
+    assert index.search("--metrics", 1)[0][0] == "cli:0"
+
+
+def test_save_load_round_trip(tmp_path):
+    index = build()
+    path = str(tmp_path / "bm25.pkl")
+    index.save(path)
+    loaded = BM25Index.load(path)
+
+    assert loaded.documents == index.documents
+    assert loaded.postings == index.postings
+    assert loaded.total_length == index.total_length
+    assert loaded.search("warp occupancy", 4) == index.search("warp occupancy", 4)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+    assert len(BM25Index.load(str(tmp_path / "missing.pkl"))) == 0
+
+
+def test_search_with_allowed_ids():
+    index = build()
+    unrestricted = dict(index.search("warp", 4))
+    assert set(unrestricted) == {"guide:0", "guide:1"}
+
+    # Both the probe (small allowed set) and the scan (large allowed set) paths
+    assert index.search("warp", 4, allowed={"guide:1"}) == [("guide:1", unrestricted["guide:1"])]
+    large = set(DOCUMENTS) | {f"other:{i}" for i in range(10)}
+    assert dict(index.search("warp", 4, allowed=large)) == unrestricted
+    assert index.search("warp", 4, allowed={"cli:1"}) == []
+    assert index.search("warp", 4, allowed=set()) == []
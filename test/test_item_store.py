@@ -0,0 +1,81 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "fastapi"))
+
+from item_store import MemoryItemStore, SqliteItemStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    store = MemoryItemStore() if request.param == "memory" else SqliteItemStore(str(tmp_path / "items.db"), 2)
+    yield store
+    store.close()
+
+
+def all_pages(store, limit: int, item_name: str = None) -> list[list[int]]:
+    pages, cursor = [], None
+    while True:
+        items, cursor = store.list_items(limit, cursor, item_name)
+        pages.append([item["item_id"] for item in items])
+        if cursor is None:
+            return pages
+
+
+def test_cursor_pages_cover_every_item_once(store):
+    for i in range(23):
+        store.add("even" if i % 2 == 0 else "odd")
+
+    pages = all_pages(store, 5)
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 3]
+    assert sum(pages, []) == list(range(1, 24))
+
+    odd = sum(all_pages(store, 4, "odd"), [])
+    assert odd == list(range(2, 24, 2))
+
+
+def test_deleted_items_leave_the_pages(store):
+    ids = [store.add("item")["item_id"] for _ in range(6)]
+    assert store.delete(ids[2])
+    assert not store.delete(ids[2])
+    assert store.get(ids[2]) is None
+    assert sum(all_pages(store, 2), []) == [1, 2, 4, 5, 6]
+    assert sum(all_pages(store, 2, "item"), []) == [1, 2, 4, 5, 6]
+
+
+def test_exact_last_page_has_no_next_cursor(store):
+    for _ in range(4):
+        store.add("item")
+    items, cursor = store.list_items(4)
+    assert len(items) == 4 and cursor is None
+
+
+def test_seed_only_fills_an_empty_store(store):
+    store.seed(["Foo", "Bar"])
+    store.seed(["Baz"])
+    assert [item["item_name"] for item in store.list_items(10)[0]] == ["Foo", "Bar"]
+    assert store.count() == 2
+
+
+def test_memory_store_pages_while_deleting():
+    store = MemoryItemStore()
+    ids = [store.add("item")["item_id"] for _ in range(2000)]
+    errors = []
+
+    def page_through():
+        try:
+            for _ in range(50):
+                all_pages(store, 7)
+        except Exception as ex:
+            errors.append(ex)
+
+    reader = threading.Thread(target=page_through)
+    reader.start()
+    for item_id in ids[::2]:
+        store.delete(item_id)
+    reader.join()
+    assert not errors
+    assert sum(all_pages(store, 7), []) == ids[1::2]
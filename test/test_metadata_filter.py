@@ -0,0 +1,51 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mcp"))
+
+from metadata_filter import build_filters, matches_where, matches_where_document
+
+# Stored metadata as written by pdf_ingest, page is 0-based
+ENTRIES = [
+    {"document": "ProfilingGuide", "page": page, "chunk": chunk}
+    for page in range(5) for chunk in range(2)
+] + [{"document": "NsightCompute", "page": 0, "chunk": 0}]
+
+
+def matching(arguments: dict) -> list[dict]:
+    where, _ = build_filters(arguments)
+    return [metadata for metadata in ENTRIES if matches_where(metadata, where)]
+
+
+def test_no_arguments_build_no_filters():
+    assert build_filters({}) == (None, None)
+
+
+def test_page_range_is_one_based():
+    pages = {metadata["page"] for metadata in matching({"document": "ProfilingGuide", "page_from": 2, "page_to": 3})}
+    # Pages 2-3 as shown in results are stored as 1 and 2
+    assert pages == {1, 2}
+
+
+def test_document_names_accept_lists_and_pdf_suffix():
+    assert {m["document"] for m in matching({"document": "NsightCompute.pdf"})} == {"NsightCompute"}
+    assert len(matching({"document": ["NsightCompute", "ProfilingGuide"]})) == len(ENTRIES)
+
+
+def test_metadata_operators():
+    assert all(m["chunk"] >= 1 for m in matching({"metadata": {"chunk": {"$gte": 1}}}))
+    assert {m["page"] for m in matching({"metadata": {"page": [0, 4]}})} == {0, 4}
+
+
+def test_unknown_operator_is_rejected():
+    with pytest.raises(ValueError):
+        build_filters({"metadata": {"page": {"$bad": 1}}})
+
+
+def test_where_document():
+    _, where_document = build_filters({"contains": "evict_first"})
+    assert matches_where_document("uses evict_first policy", where_document)
+    assert not matches_where_document("uses evict_last policy", where_document)
+    assert matches_where_document("anything", None)
@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mcp"))
+
+from page_cache import PageCache
+
+PAGES = ["first page", "zweite Seite ü", "", "fourth page " * 200]
+
+
+class CountingParser:
+    def __init__(self, pages: list[str] = PAGES, delay: float = 0):
+        self.pages = pages
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, pdf_path: str) -> list[str]:
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return list(self.pages)
+
+
+def make_pdf(tmp_path, content: bytes = b"%PDF-1.4 original") -> str:
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_pages_round_trip_and_survive_a_new_cache(tmp_path):
+    pdf_path = make_pdf(tmp_path)
+    parse = CountingParser()
+    document = PageCache(str(tmp_path / "cache")).get(pdf_path, parse)
+    assert [text for _, text in document.pages()] == PAGES
+    assert list(document.pages(1, 3)) == [(1, PAGES[1]), (2, "")]
+
+    # A new process reads the file written by the first one without parsing
+    cache = PageCache(str(tmp_path / "cache"))
+    assert cache.peek(pdf_path) is not None
+    assert cache.get(pdf_path, parse).page(3) == PAGES[3]
+    assert parse.calls == 1
+
+
+def test_stale_mtime_or_size_reparses(tmp_path):
+    pdf_path = make_pdf(tmp_path)
+    cache = PageCache(str(tmp_path / "cache"))
+    cache.get(pdf_path, CountingParser())
+
+    # Same size, newer mtime
+    stat = os.stat(pdf_path)
+    os.utime(pdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cache.peek(pdf_path) is None
+    parse = CountingParser(["changed"])
+    assert cache.get(pdf_path, parse).page(0) == "changed"
+    assert parse.calls == 1
+
+    # Different size, mtime put back to the cached value
+    mtime_ns = os.stat(pdf_path).st_mtime_ns
+    with open(pdf_path, "ab") as f:
+        f.write(b" appended")
+    os.utime(pdf_path, ns=(mtime_ns, mtime_ns))
+    assert cache.peek(pdf_path) is None
+    parse = CountingParser(["grown"])
+    assert PageCache(str(tmp_path / "cache")).get(pdf_path, parse).page(0) == "grown"
+    assert parse.calls == 1
+
+
+def test_concurrent_cold_reads_parse_once(tmp_path):
+    for trial in range(10):
+        trial_dir = tmp_path / str(trial)
+        trial_dir.mkdir()
+        pdf_path = make_pdf(trial_dir)
+        cache = PageCache(str(trial_dir / "cache"))
+        parse = CountingParser(delay=0.01)
+        errors = []
+
+        def read():
+            try:
+                assert cache.get(pdf_path, parse).page(3) == PAGES[3]
+            except Exception as ex:
+                errors.append(ex)
+
+        threads = [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not errors
+        assert parse.calls == 1
+        assert not [name for name in os.listdir(trial_dir / "cache") if name.endswith(".tmp")]
@@ -0,0 +1,131 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mcp"))
+
+chromadb = pytest.importorskip("chromadb")
+
+from bm25_index import BM25Index
+from embedding_backend import HashingEmbeddingFunction
+from pdf_ingest import ingest_documents, load_manifest, LEXICAL_INDEX_NAME
+
+
+# Minimal PDF with one line of Helvetica text per page
+def write_pdf(path: str, pages: list[str]):
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {len(objects)} 0 R "
+                       f"/Resources << /Font << /F1 3 0 R >> >> >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    data += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+
+    # A rewrite within the same mtime tick must still look modified
+    previous = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+    with open(path, "wb") as f:
+        f.write(data)
+    mtime_ns = max(os.stat(path).st_mtime_ns, previous + 1_000_000_000)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def index(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    chroma_path = str(tmp_path / "chroma")
+    embedding_function = HashingEmbeddingFunction(dim=64)
+    client = chromadb.PersistentClient(path=chroma_path)
+    collection = client.get_or_create_collection("test", embedding_function=embedding_function)
+
+    def ingest(**kwargs):
+        options = {"chunk_size": 40, "chunk_overlap": 10}
+        options.update(kwargs)
+        return ingest_documents(collection, embedding_function, [str(docs)], workers=1, batch_size=8,
+                                chroma_path=chroma_path, **options)
+
+    write_pdf(str(docs / "a.pdf"), ["warp stall sampling reports the reason a warp could not issue",
+                                    "achieved occupancy is the ratio of active warps"])
+    write_pdf(str(docs / "b.pdf"), ["the memory workload analysis section shows L2 throughput"])
+    return docs, chroma_path, collection, ingest
+
+
+def indexed_ids(chroma_path: str) -> dict[str, set[str]]:
+    files = load_manifest(chroma_path)["files"]
+    return {os.path.basename(path): set(entry["ids"]) for path, entry in files.items()}
+
+
+# The manifest, the collection and the lexical index hold exactly the same chunk ids
+def assert_consistent(chroma_path: str, collection) -> set[str]:
+    ids = set().union(*indexed_ids(chroma_path).values())
+    assert set(collection.get(include=[])["ids"]) == ids
+    assert set(BM25Index.load(os.path.join(chroma_path, LEXICAL_INDEX_NAME)).documents) == ids
+    return ids
+
+
+def test_unchanged_rerun_indexes_nothing(index):
+    docs, chroma_path, collection, ingest = index
+    first = ingest()
+    assert first["indexed"] == 2 and first["chunks"] > 3
+    ids = assert_consistent(chroma_path, collection)
+
+    # A touched file with identical content only refreshes its fingerprint
+    os.utime(docs / "b.pdf", ns=(os.stat(docs / "b.pdf").st_mtime_ns + 10**9,) * 2)
+    second = ingest()
+    assert second["indexed"] == 0 and second["unchanged"] == 2
+    assert assert_consistent(chroma_path, collection) == ids
+
+
+def test_modified_file_drops_stale_chunks(index):
+    docs, chroma_path, collection, ingest = index
+    ingest()
+    before = indexed_ids(chroma_path)
+
+    write_pdf(str(docs / "a.pdf"), ["short"])
+    stats = ingest()
+    after = indexed_ids(chroma_path)
+
+    assert stats["indexed"] == 1 and stats["unchanged"] == 1
+    assert len(after["a.pdf"]) == 1
+    assert after["b.pdf"] == before["b.pdf"]
+    ids = assert_consistent(chroma_path, collection)
+    assert not (before["a.pdf"] - after["a.pdf"]) & ids
+
+
+def test_deleted_file_is_removed(index):
+    docs, chroma_path, collection, ingest = index
+    ingest()
+    removed = indexed_ids(chroma_path)["b.pdf"]
+
+    os.remove(docs / "b.pdf")
+    stats = ingest()
+
+    assert stats["removed"] == 1 and stats["unchanged"] == 1
+    assert set(indexed_ids(chroma_path)) == {"a.pdf"}
+    assert not removed & assert_consistent(chroma_path, collection)
+
+
+def test_chunking_change_reindexes_everything(index):
+    docs, chroma_path, collection, ingest = index
+    ingest()
+    before = assert_consistent(chroma_path, collection)
+
+    stats = ingest(chunk_size=0, chunk_overlap=0)
+    assert stats["indexed"] == 2
+    # Whole pages are keyed <document>:<page>
+    assert assert_consistent(chroma_path, collection) == {"a:0", "a:1", "b:0"}
+    assert not before & {"a:0", "a:1", "b:0"}
+    assert load_manifest(chroma_path)["chunking"] == {"size": 0, "overlap": 0, "unit": "chars"}
@@ -0,0 +1,88 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mcp"))
+
+import mcp_server_stdio as server
+from snippets import extract_snippet
+
+WORDS = "warp stall sampling reports the reason a warp could not issue on each cycle".split()
+
+
+def make_hits(count: int, length: int) -> list[tuple]:
+    hits = []
+    for i in range(count):
+        text = " ".join(WORDS[(i + j) % len(WORDS)] for j in range(length // 6))
+        metadata = {"document": "ProfilingGuide", "page": i, "chunk": 0, "start_char": 0, "end_char": len(text)}
+        hits.append((f"ProfilingGuide:{i}:0", text, 0.1 + i / 100, metadata))
+    return hits
+
+
+@pytest.mark.parametrize("num_results", [1, 5, 10, 50])
+@pytest.mark.parametrize("budget", [300, 500, 1000, 2000, 8000])
+def test_format_hits_stays_within_budget(num_results, budget):
+    text = server.format_hits(make_hits(num_results, 1500), None, "warp stall", budget)
+    assert len(text) <= budget
+
+
+def test_large_budgets_differ():
+    hits = make_hits(10, 1500)
+    sizes = [len(server.format_hits(hits, None, "warp stall", budget)) for budget in (500, 1000, 2000)]
+    assert sizes[0] < sizes[1] < sizes[2]
+
+
+def test_results_left_out_are_counted():
+    text = server.format_hits(make_hits(50, 1500), None, "warp stall", 2000)
+    shown = text.count("Result ")
+    assert 0 < shown < 50
+    assert f"({50 - shown} more result(s) left out" in text
+
+
+def test_short_results_leave_room_for_long_ones():
+    hits = make_hits(1, 3000) + [(f"short:{i}", "warp stall", 0.2, {}) for i in range(4)]
+    text = server.format_hits(hits, None, "warp stall", 2000)
+    assert len(text) <= 2000
+    assert text.count("Result ") == 5
+    # The long result gets far more than an equal fifth of the budget
+    snippet = text.split("Snippet: ", 1)[1].split(server.RESULT_SEPARATOR, 1)[0]
+    assert len(snippet) > 2000 // 5
+
+
+def test_no_budget_returns_full_contents():
+    hits = make_hits(3, 1500)
+    text = server.format_hits(hits, None, "warp stall", 0)
+    assert "Snippet:" not in text
+    assert all(hit[1] in text for hit in hits)
+
+
+@pytest.mark.parametrize("max_chars", [10, 50, 200])
+def test_extract_snippet_counts_ellipses(max_chars):
+    text = " ".join(WORDS * 20)
+    snippet = extract_snippet(text, "issue cycle", max_chars)
+    assert len(snippet) <= max_chars
+
+
+@pytest.mark.parametrize("queries", [1, 2, 5])
+@pytest.mark.parametrize("budget", [100, 300, 1000, 2000, 8000])
+def test_query_groups_stay_within_budget(queries, budget):
+    groups = [(f"warp stall {i}", make_hits(5, 1500) if i % 3 else []) for i in range(queries)]
+    text = server.fit_query_groups(groups, budget)
+    assert len(text) <= budget
+
+
+def test_query_groups_left_out_are_counted():
+    groups = [(f"warp stall {i}", make_hits(5, 1500)) for i in range(5)]
+    text = server.fit_query_groups(groups, 1000)
+    shown = text.count("Query ")
+    assert 0 < shown < 5
+    assert f"({5 - shown} more query(ies) left out" in text
+
+
+def test_query_groups_without_budget_return_full_contents():
+    groups = [("warp stall", make_hits(2, 1500)), ("occupancy", [])]
+    text = server.fit_query_groups(groups, 0)
+    assert "Snippet:" not in text
+    assert server.NO_QUERY_RESULTS in text
+    assert all(hit[1] in text for hit in groups[0][1])
@@ -0,0 +1,100 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mcp"))
+
+from text_chunker import chunk_spans, iter_chunks, WORD_PATTERN
+
+WORDS = ["kernel", "warp", "occupancy", "sm__cycles_elapsed.avg", "L2", "a", "--metrics", "throughput"]
+
+
+def random_text(seed: int, words: int = 400) -> str:
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(words):
+        parts.append(rng.choice(WORDS))
+        parts.append(rng.choice([" ", " ", " ", "\n", "  "]))
+    return "".join(parts)
+
+
+def assert_covers(text: str, spans: list[tuple[int, int]]):
+    covered = [False] * len(text)
+    for start, end in spans:
+        for i in range(start, end):
+            covered[i] = True
+    missing = [i for i, char in enumerate(text) if not covered[i] and not char.isspace()]
+    assert not missing, f"characters not in any chunk: {missing[:10]}"
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("size,overlap", [(100, 0), (100, 20), (250, 50), (1000, 200), (37, 36)])
+def test_char_chunks_cover_the_page_within_size_and_overlap(seed, size, overlap):
+    text = random_text(seed)
+    spans = list(chunk_spans(text, size, overlap))
+
+    assert spans[0][0] == 0
+    assert spans[-1][1] == len(text)
+    assert_covers(text, spans)
+    for (start, end), (next_start, next_end) in zip(spans, spans[1:]):
+        assert next_start > start
+        # Consecutive chunks touch or overlap, by at most the configured overlap
+        assert 0 <= end - next_start <= overlap
+    for start, end in spans:
+        assert 0 < end - start <= size
+
+
+def test_char_chunks_prefer_whitespace_cuts():
+    text = random_text(7)
+    spans = list(chunk_spans(text, 120, 30))
+    for start, end in spans[:-1]:
+        assert text[end].isspace()
+    for start, end in spans[1:]:
+        assert text[start - 1].isspace()
+
+
+def test_text_without_whitespace_is_cut_at_the_size():
+    text = "x" * 1050
+    spans = list(chunk_spans(text, 100, 10))
+    assert all(end - start <= 100 for start, end in spans)
+    assert_covers(text, spans)
+    assert spans[-1][1] == len(text)
+
+
+@pytest.mark.parametrize("size,overlap", [(50, 0), (50, 10), (7, 6)])
+def test_token_chunks(size, overlap):
+    text = random_text(3)
+    words = [m.span() for m in WORD_PATTERN.finditer(text)]
+    spans = list(chunk_spans(text, size, overlap, unit="tokens"))
+
+    assert_covers(text, spans)
+    for start, end in spans:
+        inside = [word for word in words if start <= word[0] and word[1] <= end]
+        assert 0 < len(inside) <= size
+    for (start, end), (next_start, _) in zip(spans, spans[1:]):
+        shared = [word for word in words if next_start <= word[0] and word[1] <= end]
+        assert len(shared) == overlap
+
+
+def test_iter_chunks_offsets_match_the_page_text():
+    pages = [(0, random_text(1)), (1, "   \n  "), (2, ""), (3, random_text(2, words=30))]
+    chunks = list(iter_chunks(pages, 200, 40))
+
+    assert {page for page, *_ in chunks} == {0, 3}
+    texts = dict(pages)
+    for page, chunk_index, start, end, chunk in chunks:
+        assert texts[page][start:end] == chunk
+        assert chunk.strip()
+
+    # Chunk indexes count up per page and (page, start) is unique, ids are built from it
+    for page in (0, 3):
+        indexes = [chunk_index for p, chunk_index, *_ in chunks if p == page]
+        assert indexes == list(range(len(indexes)))
+    assert len({(page, start) for page, _, start, _, _ in chunks}) == len(chunks)
+
+
+def test_iter_chunks_size_zero_keeps_whole_pages():
+    pages = [(0, "first page"), (1, "  "), (2, "third page\n")]
+    assert list(iter_chunks(pages, 0)) == [(0, 0, 0, 10, "first page"), (2, 0, 0, 11, "third page\n")]